@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'showroom.profiling.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +54,66 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'backend.urls'
 
+# Per-view request profiling, reported at /__perf__ and in Server-Timing
+# headers. Off by default; when on, only PERF_SAMPLE_RATE of requests are
+# measured and the last PERF_WINDOW samples per view are kept in memory.
+PERF_PROFILING_ENABLED = False
+PERF_SAMPLE_RATE = 0.05
+PERF_WINDOW = 500
+
+# Test-ride scheduling: daily slot start times, slot length, how far ahead
+# customers can book, and how often each worker reloads its in-memory
+# availability index to see bookings taken by other workers.
+TEST_RIDE_SLOT_TIMES = ['10:00', '11:00', '12:00', '14:00', '15:00', '16:00', '17:00']
+TEST_RIDE_SLOT_MINUTES = 60
+TEST_RIDE_BOOKING_DAYS = 14
+TEST_RIDE_INDEX_TTL = 30
+
+# Each worker keeps the active catalog and the bikes.json body in memory and
+# rebuilds them after CATALOG_SNAPSHOT_TTL seconds, or at once when a bike is
+# saved in that worker.
+CATALOG_SNAPSHOT_TTL = 30
+
+# Bike stock per branch and colour. Each worker keeps the units in memory,
+# updates them on the stock movements it records and reloads them after
+# STOCK_INDEX_TTL seconds to see movements recorded by other workers.
+STOCK_INDEX_TTL = 30
+
+# Service bay capacity. Daily capacity is the smaller of what the bays and
+# the technicians can turn around; ServiceDayCapacity rows override the bays
+# and technician hours for individual days (holidays, training).
+SERVICE_BAYS = 4
+SERVICE_TECHNICIAN_HOURS = 24
+SERVICE_WORKDAY_HOURS = 8
+SERVICE_HOURS_PER_BOOKING = 2
+SERVICE_CLOSED_WEEKDAYS = []
+SERVICE_BOOKING_DAYS = 30
+
+# Leads older than LEAD_RETENTION_DAYS are moved to the lead archive by
+# `python manage.py archive_leads`, LEAD_ARCHIVE_BATCH_SIZE rows per
+# transaction.
+LEAD_RETENTION_DAYS = 365
+LEAD_ARCHIVE_BATCH_SIZE = 500
+
+# Lead form protection. Each client IP and phone number may post a form
+# FORM_RATE_LIMIT times in a burst, refilling over FORM_RATE_LIMIT_WINDOW
+# seconds. The 'memory' backend is per worker; 'sqlite' shares the buckets
+# between workers through FORM_RATE_LIMIT_DB. Behind proxies, set
+# FORM_RATE_LIMIT_TRUSTED_PROXIES to how many of them append to
+# X-Forwarded-For; the client address is read that many entries from the
+# right. Posts scoring SPAM_SCORE_THRESHOLD or more are dropped.
+FORM_RATE_LIMIT = 5
+FORM_RATE_LIMIT_WINDOW = 600
+FORM_RATE_LIMIT_BACKEND = 'memory'
+FORM_RATE_LIMIT_DB = BASE_DIR / 'ratelimit.sqlite3'
+FORM_RATE_LIMIT_TRUSTED_PROXIES = 0
+SPAM_SCORE_THRESHOLD = 5
+
+# Bike price and spec history stores a full snapshot every
+# BIKE_HISTORY_SNAPSHOT_EVERY entries per bike and diffs in between, which
+# bounds the entries replayed for a point-in-time catalog.
+BIKE_HISTORY_SNAPSHOT_EVERY = 20
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -79,9 +140,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts, so check-then-insert
+        # transactions (e.g. service bookings against day capacity) run one at
+        # a time instead of both passing the check. This applies to every
+        # atomic() block on the site, admin saves included: a transaction waits
+        # for any other open one to finish, and fails with "database is locked"
+        # after the 5 second busy timeout. Keep transactions short. Needs
+        # Django 5.1 or later.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read-only snapshot of the primary used for catalog (Bike/Offer) reads.
+# Created and refreshed with `python manage.py refresh_catalog_replica`; the
+# alias is only registered once the snapshot exists, so restart workers after
+# the first refresh.
+CATALOG_REPLICA_PATH = BASE_DIR / 'db.replica.sqlite3'
+
+if CATALOG_REPLICA_PATH.exists():
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{CATALOG_REPLICA_PATH}?mode=ro',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['showroom.routers.CatalogReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -0,0 +1,46 @@
+"""
+Settings for workers that only serve the public showroom.
+
+Same as backend.settings minus the admin, auth and session apps and their
+middleware: nothing public needs a logged-in user, and flash messages after a
+form post travel in a signed cookie instead of the session. Staff keep using
+workers on the full settings. Select with
+DJANGO_SETTINGS_MODULE=backend.settings_public.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+STAFF_ONLY_APPS = {
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in STAFF_ONLY_APPS]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+    )
+]
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'context_processors': [
+                processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+                if processor != 'django.contrib.auth.context_processors.auth'
+            ],
+        },
+    },
+]
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+ROOT_URLCONF = 'backend.urls_public'
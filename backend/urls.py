@@ -21,6 +21,7 @@ from django.urls import include, path
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('showroom.urls')),
+    path('', include('showroom.staff_urls')),
 ]
 
 if settings.DEBUG:
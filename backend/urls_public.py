@@ -0,0 +1,15 @@
+"""URL configuration for public-only workers (backend.settings_public)
+
+The showroom pages, APIs and form handlers, without the admin or the
+staff-only reporting endpoints.
+"""
+from django.conf import settings
+from django.conf.urls.static import static
+from django.urls import include, path
+
+urlpatterns = [
+    path('', include('showroom.urls')),
+]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.BASE_DIR / 'static')
@@ -0,0 +1,16 @@
+"""Gunicorn settings, picked up automatically when gunicorn starts from this directory"""
+
+
+def post_worker_init(worker):
+	# Build the catalog snapshot, compile templates and resolve URLs before the
+	# worker accepts connections, so the first customer after a deploy or a
+	# worker recycle does not pay for them.
+	from showroom.warmup import warm_caches
+
+	try:
+		timings = warm_caches()
+	except Exception:
+		# A cold worker is still a working one; never fail the boot over warm-up.
+		worker.log.exception('Cache warm-up failed')
+		return
+	worker.log.info('Warmed caches in %.1f ms', sum(timings.values()))
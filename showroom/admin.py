@@ -1,10 +1,53 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.text import capfirst
 
-from .models import Bike, ContactInquiry, Offer, ServiceBooking, TestRideRequest
+from .models import (
+	ArchivedLead, Bike, BikeVersion, Branch, ContactInquiry, Customer, Offer, ServiceBooking, ServiceDayCapacity,
+	StockLevel, StockMovement, TestRideRequest, TestRideSlot,
+)
+from .pricing import PRICE_FIELDS, apply_price_revision, parse_price_sheet, price_diff
+from .routers import PRIMARY_DB
+from .stock import listed_colour, record_movement
+
+
+class PrimaryDatabaseAdmin(admin.ModelAdmin):
+	"""Keep admin reads on the primary so edits never show stale replica data"""
+	using = PRIMARY_DB
+
+	def get_queryset(self, request):
+		return super().get_queryset(request).using(self.using)
+
+	def formfield_for_foreignkey(self, db_field, request, **kwargs):
+		return super().formfield_for_foreignkey(db_field, request, using=self.using, **kwargs)
+
+
+class PriceSheetForm(forms.Form):
+	"""A price sheet upload; the preview posts the parsed text back to apply it"""
+	sheet = forms.FileField(required=False, help_text='CSV with a slug column and any of ex_showroom_price, on_road_price, emi.')
+	sheet_text = forms.CharField(required=False, widget=forms.HiddenInput)
+
+	def clean(self):
+		cleaned_data = super().clean()
+		if cleaned_data.get('sheet'):
+			try:
+				cleaned_data['sheet_text'] = cleaned_data['sheet'].read().decode('utf-8-sig')
+			except UnicodeDecodeError:
+				raise forms.ValidationError('Save the price sheet as UTF-8 CSV.')
+		if not cleaned_data.get('sheet_text'):
+			raise forms.ValidationError('Choose a price sheet to upload.')
+		return cleaned_data
 
 
 @admin.register(Bike)
-class BikeAdmin(admin.ModelAdmin):
+class BikeAdmin(PrimaryDatabaseAdmin):
 	list_display = ('name', 'family', 'is_featured', 'is_active', 'ex_showroom_price', 'on_road_price', 'created_at')
 	list_filter = ('is_featured', 'is_active', 'family', 'cc_category', 'created_at')
 	search_fields = ('name', 'family', 'slug', 'cc_category')
@@ -12,7 +55,7 @@ class BikeAdmin(admin.ModelAdmin):
 	
 	fieldsets = (
 		('Essential Information', {
-			'fields': ('name', 'slug', 'family', 'is_featured', 'is_active', 'hero_image'),
+			'fields': ('name', 'slug', 'family', 'is_featured', 'is_active', 'hero_image', 'demo_units'),
 			'description': 'Only name is required. Slug will be auto-generated if left empty.'
 		}),
 		('Pricing', {
@@ -52,12 +95,73 @@ class BikeAdmin(admin.ModelAdmin):
 			obj.slug = slugify(obj.name)
 		super().save_model(request, obj, form, change)
 
+	def get_urls(self):
+		revise_prices = path(
+			'revise-prices/', self.admin_site.admin_view(self.revise_prices_view), name='showroom_bike_revise_prices',
+		)
+		return [revise_prices, *super().get_urls()]
+
+	def revise_prices_view(self, request):
+		"""Upload a CSV price sheet, preview the price changes and apply them in one go"""
+		if not self.has_change_permission(request):
+			raise PermissionDenied
+		form = PriceSheetForm(request.POST or None, request.FILES or None)
+		context = {
+			**self.admin_site.each_context(request),
+			'opts': self.model._meta,
+			'title': 'Revise prices',
+			'form': form,
+			'price_fields': PRICE_FIELDS,
+		}
+		if request.method == 'POST' and form.is_valid():
+			revisions, errors = parse_price_sheet(form.cleaned_data['sheet_text'])
+			changes, unknown = price_diff(revisions) if not errors else ([], [])
+			if 'apply' in request.POST and not errors:
+				with transaction.atomic(using=PRIMARY_DB):
+					revised = apply_price_revision(changes)
+					self.log_price_revision(request, changes)
+				self.message_user(request, f'Revised prices for {revised} bikes.', messages.SUCCESS)
+				return redirect('admin:showroom_bike_changelist')
+			form = PriceSheetForm(initial={'sheet_text': form.cleaned_data['sheet_text']})
+			context.update({
+				'form': form,
+				'previewed': True,
+				'errors': errors,
+				'unknown': unknown,
+				'rows': [
+					(bike, [changed.get(name) for name in PRICE_FIELDS])
+					for bike, changed in changes
+				],
+			})
+		return TemplateResponse(request, 'admin/showroom/bike/revise_prices.html', context)
+
+	def log_price_revision(self, request, changes):
+		"""Record a change in each revised bike's admin history, with the old and new prices"""
+		content_type = ContentType.objects.db_manager(PRIMARY_DB).get_for_model(Bike)
+		entries = []
+		for bike, changed in changes:
+			prices = ', '.join(
+				f'{capfirst(Bike._meta.get_field(name).verbose_name)} {current} -> {revised}'
+				for name, (current, revised) in changed.items()
+			)
+			entries.append(LogEntry(
+				user_id=request.user.pk,
+				content_type=content_type,
+				object_id=str(bike.pk),
+				object_repr=str(bike)[:200],
+				action_flag=CHANGE,
+				change_message=f'Revised from a price sheet: {prices}.',
+			))
+		LogEntry.objects.using(PRIMARY_DB).bulk_create(entries)
+
 
 @admin.register(Offer)
-class OfferAdmin(admin.ModelAdmin):
+class OfferAdmin(PrimaryDatabaseAdmin):
 	list_display = ('title', 'bike', 'discount_percentage', 'discount_amount', 'valid_from', 'valid_until', 'is_active', 'created_at')
 	list_filter = ('is_active', 'valid_from', 'valid_until', 'created_at')
 	search_fields = ('title', 'description', 'bike__name')
+	# bike is nullable, so the changelist won't select_related() it on its own.
+	list_select_related = ('bike',)
 	readonly_fields = ('created_at', 'updated_at')
 	date_hierarchy = 'valid_from'
 	
@@ -79,12 +183,21 @@ class OfferAdmin(admin.ModelAdmin):
 	)
 
 
+@admin.register(TestRideSlot)
+class TestRideSlotAdmin(admin.ModelAdmin):
+	list_display = ('bike', 'date', 'start_time', 'capacity', 'booked')
+	list_filter = ('date', 'bike')
+	list_select_related = ('bike',)
+	readonly_fields = ('booked',)
+	date_hierarchy = 'date'
+
+
 @admin.register(TestRideRequest)
 class TestRideRequestAdmin(admin.ModelAdmin):
 	list_display = ('name', 'bike_slug', 'preferred_date', 'preferred_time', 'phone', 'email', 'created_at')
 	search_fields = ('name', 'phone', 'email', 'bike_slug')
 	list_filter = ('preferred_date', 'bike_slug', 'created_at')
-	readonly_fields = ('created_at',)
+	readonly_fields = ('created_at', 'slot', 'customer')
 	date_hierarchy = 'preferred_date'
 
 
@@ -93,14 +206,162 @@ class ContactInquiryAdmin(admin.ModelAdmin):
 	list_display = ('name', 'phone', 'email', 'bike_slug', 'created_at')
 	search_fields = ('name', 'phone', 'email', 'bike_slug', 'message')
 	list_filter = ('bike_slug', 'created_at')
-	readonly_fields = ('created_at',)
+	readonly_fields = ('created_at', 'customer')
 	date_hierarchy = 'created_at'
 
 
 @admin.register(ServiceBooking)
 class ServiceBookingAdmin(admin.ModelAdmin):
-	list_display = ('name', 'bike_slug', 'preferred_date', 'phone', 'created_at')
+	list_display = ('name', 'bike_slug', 'preferred_date', 'rescheduled_from', 'phone', 'created_at')
 	search_fields = ('name', 'phone', 'bike_slug', 'notes')
 	list_filter = ('preferred_date', 'bike_slug', 'created_at')
-	readonly_fields = ('created_at',)
+	readonly_fields = ('created_at', 'rescheduled_from', 'customer')
 	date_hierarchy = 'preferred_date'
+
+
+@admin.register(ServiceDayCapacity)
+class ServiceDayCapacityAdmin(admin.ModelAdmin):
+	list_display = ('date', 'bays', 'technician_hours', 'note')
+	date_hierarchy = 'date'
+
+
+class CustomerLeadInline(admin.TabularInline):
+	extra = 0
+	can_delete = False
+	show_change_link = True
+
+	def has_add_permission(self, request, obj=None):
+		return False
+
+
+class CustomerTestRideInline(CustomerLeadInline):
+	model = TestRideRequest
+	fields = readonly_fields = ('bike_slug', 'preferred_date', 'preferred_time', 'phone', 'email', 'created_at')
+
+
+class CustomerInquiryInline(CustomerLeadInline):
+	model = ContactInquiry
+	fields = readonly_fields = ('bike_slug', 'phone', 'email', 'message', 'created_at')
+
+
+class CustomerServiceInline(CustomerLeadInline):
+	model = ServiceBooking
+	fields = readonly_fields = ('bike_slug', 'preferred_date', 'phone', 'created_at')
+
+
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+	list_display = ('name', 'phone', 'email', 'created_at')
+	search_fields = ('name', 'phone', 'email')
+	readonly_fields = ('created_at',)
+	date_hierarchy = 'created_at'
+	inlines = (CustomerTestRideInline, CustomerInquiryInline, CustomerServiceInline)
+
+
+@admin.register(ArchivedLead)
+class ArchivedLeadAdmin(admin.ModelAdmin):
+	list_display = ('name', 'lead_type', 'bike_slug', 'phone', 'email', 'created_at', 'archived_at')
+	search_fields = ('name', 'phone', 'email', 'bike_slug')
+	list_filter = ('year', 'lead_type', 'bike_slug')
+	date_hierarchy = 'created_at'
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+
+@admin.register(BikeVersion)
+class BikeVersionAdmin(admin.ModelAdmin):
+	list_display = ('slug', 'recorded_at', 'is_snapshot', 'is_deleted', 'changed_fields')
+	search_fields = ('slug',)
+	list_filter = ('is_snapshot', 'is_deleted')
+	date_hierarchy = 'recorded_at'
+
+	@admin.display(description='Changed fields')
+	def changed_fields(self, obj):
+		return 'all' if obj.is_snapshot else ', '.join(obj.values)
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+	def has_delete_permission(self, request, obj=None):
+		return False
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+	list_display = ('name', 'slug', 'phone', 'is_active')
+	list_filter = ('is_active',)
+	prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+	list_display = ('bike', 'colour', 'branch', 'units', 'updated_at')
+	list_filter = ('branch', 'bike')
+	search_fields = ('bike__name', 'colour')
+	list_select_related = ('bike', 'branch')
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+
+class StockMovementForm(forms.ModelForm):
+
+	class Meta:
+		model = StockMovement
+		fields = ('bike', 'branch', 'colour', 'change', 'reason', 'note')
+
+	def clean(self):
+		cleaned_data = super().clean()
+		bike, branch, change = cleaned_data.get('bike'), cleaned_data.get('branch'), cleaned_data.get('change')
+		if bike and branch and change is not None and change < 0:
+			colour = listed_colour(bike, cleaned_data.get('colour', ''))
+			level = StockLevel.objects.filter(bike=bike, branch=branch, colour=colour).first()
+			held = level.units if level else 0
+			if held + change < 0:
+				raise forms.ValidationError(f'{branch} only holds {held} units of {bike} in {colour}.')
+		return cleaned_data
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+	form = StockMovementForm
+	list_display = ('created_at', 'bike', 'colour', 'branch', 'change', 'units_after', 'reason')
+	list_filter = ('reason', 'branch', 'bike')
+	search_fields = ('bike__name', 'colour', 'note')
+	list_select_related = ('bike', 'branch')
+	date_hierarchy = 'created_at'
+
+	def save_model(self, request, obj, form, change):
+		# Movements go through record_movement so levels, the stock index and
+		# the catalog payload stay in step; they are never edited afterwards.
+		movement = record_movement(obj.bike, obj.branch, obj.colour, obj.change, obj.reason, obj.note)
+		if movement is None:
+			# Another sale took the units between clean() and here.
+			messages.error(request, 'Not enough units in stock; the movement was not recorded.')
+		else:
+			obj.pk = movement.pk
+
+	def log_addition(self, request, obj, message):
+		if obj.pk is not None:
+			return super().log_addition(request, obj, message)
+
+	def response_add(self, request, obj, post_url_continue=None):
+		if obj.pk is None:
+			return redirect(request.path)
+		return super().response_add(request, obj, post_url_continue)
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+	def has_delete_permission(self, request, obj=None):
+		return False
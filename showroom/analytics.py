@@ -0,0 +1,109 @@
+"""Daily lead counts kept incrementally in LeadDailyRollup"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ArchivedLead, ContactInquiry, LeadDailyRollup, ServiceBooking, TestRideRequest
+
+LEAD_TYPES = {
+	TestRideRequest: 'test_ride',
+	ContactInquiry: 'inquiry',
+	ServiceBooking: 'service',
+}
+
+
+def bump_rollup(date, lead_type, bike_slug, source, count=1):
+	"""Add count to one rollup row, creating it on first use"""
+	key = {'date': date, 'lead_type': lead_type, 'bike_slug': bike_slug, 'source': source}
+	if LeadDailyRollup.objects.filter(**key).update(count=F('count') + count):
+		return
+	try:
+		with transaction.atomic():
+			LeadDailyRollup.objects.create(count=count, **key)
+	except IntegrityError:
+		# Another request created the row between our UPDATE and INSERT.
+		LeadDailyRollup.objects.filter(**key).update(count=F('count') + count)
+
+
+@receiver(post_save, sender=TestRideRequest)
+@receiver(post_save, sender=ContactInquiry)
+@receiver(post_save, sender=ServiceBooking)
+def count_new_lead(sender, instance, created, raw=False, **kwargs):
+	if not created or raw:
+		return
+	bump_rollup(timezone.localdate(instance.created_at), LEAD_TYPES[sender], instance.bike_slug, instance.source)
+
+
+def _daily_counts(leads, start, end, *fields):
+	leads = leads.order_by()
+	if start:
+		leads = leads.filter(created_at__date__gte=start)
+	if end:
+		leads = leads.filter(created_at__date__lte=end)
+	return (
+		leads.annotate(day=TruncDate('created_at'))
+		.values('day', 'bike_slug', 'source', *fields)
+		.annotate(count=Count('id'))
+	)
+
+
+def rebuild_rollups(start=None, end=None):
+	"""
+	Recount LeadDailyRollup rows from the lead tables, for all days or start..end.
+
+	Archived leads are counted too, so archiving never changes the totals.
+	"""
+	# A day can hold both live and archived leads for the same bike and source.
+	totals = {}
+
+	def add(entry, lead_type):
+		key = (entry['day'], lead_type, entry['bike_slug'], entry['source'])
+		totals[key] = totals.get(key, 0) + entry['count']
+
+	for model, lead_type in LEAD_TYPES.items():
+		for entry in _daily_counts(model.objects.all(), start, end):
+			add(entry, lead_type)
+	for entry in _daily_counts(ArchivedLead.objects.all(), start, end, 'lead_type'):
+		add(entry, entry['lead_type'])
+	rows = [
+		LeadDailyRollup(date=date, lead_type=lead_type, bike_slug=bike_slug, source=source, count=count)
+		for (date, lead_type, bike_slug, source), count in totals.items()
+	]
+
+	with transaction.atomic():
+		stale = LeadDailyRollup.objects.all()
+		if start:
+			stale = stale.filter(date__gte=start)
+		if end:
+			stale = stale.filter(date__lte=end)
+		stale.delete()
+		LeadDailyRollup.objects.bulk_create(rows, batch_size=1000)
+	return len(rows)
+
+
+def lead_summary(start, end, bike_slug=None, lead_type=None):
+	"""Return lead totals for start..end broken down by day, type, bike and source"""
+	rollups = LeadDailyRollup.objects.filter(date__range=(start, end))
+	if bike_slug:
+		rollups = rollups.filter(bike_slug=bike_slug)
+	if lead_type:
+		rollups = rollups.filter(lead_type=lead_type)
+
+	total = 0
+	by_day, by_type, by_bike, by_source = {}, {}, {}, {}
+	for date, kind, slug, source, count in rollups.order_by().values_list('date', 'lead_type', 'bike_slug', 'source', 'count'):
+		total += count
+		by_day[date] = by_day.get(date, 0) + count
+		by_type[kind] = by_type.get(kind, 0) + count
+		by_bike[slug] = by_bike.get(slug, 0) + count
+		by_source[source] = by_source.get(source, 0) + count
+	return {
+		'total': total,
+		'by_day': [{'date': date.isoformat(), 'count': by_day[date]} for date in sorted(by_day)],
+		'by_type': by_type,
+		'by_bike': by_bike,
+		'by_source': by_source,
+	}
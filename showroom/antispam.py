@@ -0,0 +1,228 @@
+"""Per-client rate limiting and spam scoring for the lead form endpoints"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.shortcuts import redirect
+
+from .dedupe import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# Hidden form field that people never see and bots tend to fill in.
+HONEYPOT_FIELD = 'website'
+
+_URL = re.compile(r'https?://|www\.|\[url|<a\s', re.IGNORECASE)
+_REPEATED = re.compile(r'(.)\1{7,}')
+_SPAM_WORDS = re.compile(
+	r'\b(casino|crypto|bitcoin|forex|viagra|cialis|seo services?|backlinks?|loan offer|betting|porn)\b',
+	re.IGNORECASE,
+)
+
+
+def spam_score(data):
+	"""Return a cheap content score for a form submission; higher is more likely spam"""
+	if data.get(HONEYPOT_FIELD):
+		return 100
+	name = data.get('name', '')
+	text = ' '.join(data.get(field, '') for field in ('notes', 'message'))
+	score = 0
+	score += 2 * len(_URL.findall(text))
+	score += 3 * len(_SPAM_WORDS.findall(text))
+	if _URL.search(name) or any(char.isdigit() for char in name):
+		score += 3
+	if _REPEATED.search(text):
+		score += 1
+	if len(text) > 2000:
+		score += 2
+	if data.get('phone') and not normalize_phone(data['phone']):
+		score += 2
+	return score
+
+
+class TokenBucketLimiter:
+	"""
+	In-process token buckets: each key may spend `capacity` requests at once
+	and regains one every window / capacity seconds.
+	"""
+	max_keys = 50000
+
+	def __init__(self, capacity, window):
+		self.capacity = capacity
+		self.rate = capacity / window
+		self._lock = threading.Lock()
+		self._buckets = {}
+
+	def allow(self, key, now=None):
+		now = now if now is not None else time.monotonic()
+		with self._lock:
+			tokens, updated = self._buckets.get(key, (self.capacity, now))
+			tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+			allowed = tokens >= 1
+			self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+			if len(self._buckets) > self.max_keys:
+				self._prune(now)
+		return allowed
+
+	def _prune(self, now):
+		# Buckets that have refilled completely carry no state worth keeping.
+		full_after = self.capacity / self.rate
+		self._buckets = {
+			key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+			if now - updated < full_after
+		}
+
+	def configure(self, capacity, window):
+		"""Switch to a new capacity and window, starting every key with a full bucket"""
+		self.capacity = capacity
+		self.rate = capacity / window
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self._buckets.clear()
+
+
+class SQLiteTokenBucketLimiter(TokenBucketLimiter):
+	"""
+	Token buckets kept in a small SQLite file so every worker on the host
+	shares them. It lives outside the main database so limiter writes never
+	wait on lead inserts or admin edits. If the file stays locked past the
+	timeout, the worker falls back to its own in-memory buckets rather than
+	failing the post.
+	"""
+	lock_timeout = 1
+
+	def __init__(self, capacity, window, path):
+		super().__init__(capacity, window)
+		self.path = str(path)
+		self._local = threading.local()
+
+	def _connection(self):
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None)
+			conn.execute('PRAGMA journal_mode=WAL')
+			conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+			self._local.conn = conn
+		return conn
+
+	def allow(self, key, now=None):
+		now = now if now is not None else time.time()
+		try:
+			return self._allow_shared(key, now)
+		except sqlite3.OperationalError:
+			logger.warning('Rate limit database unavailable; using in-process buckets', exc_info=True)
+			return super().allow(key, now)
+
+	def _allow_shared(self, key, now):
+		conn = self._connection()
+		conn.execute('BEGIN IMMEDIATE')
+		try:
+			row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+			tokens, updated = row if row else (self.capacity, now)
+			tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+			allowed = tokens >= 1
+			conn.execute(
+				'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+				(key, tokens - 1 if allowed else tokens, now),
+			)
+			self._local.calls = getattr(self._local, 'calls', 0) + 1
+			if self._local.calls % 1000 == 0:
+				conn.execute('DELETE FROM buckets WHERE updated < ?', (now - self.capacity / self.rate,))
+			conn.execute('COMMIT')
+		except sqlite3.Error:
+			if conn.in_transaction:
+				conn.execute('ROLLBACK')
+			raise
+		return allowed
+
+	def reset(self):
+		super().reset()
+		self._connection().execute('DELETE FROM buckets')
+
+
+def _build_limiter():
+	capacity = settings.FORM_RATE_LIMIT
+	window = settings.FORM_RATE_LIMIT_WINDOW
+	if settings.FORM_RATE_LIMIT_BACKEND == 'sqlite':
+		return SQLiteTokenBucketLimiter(capacity, window, settings.FORM_RATE_LIMIT_DB)
+	return TokenBucketLimiter(capacity, window)
+
+
+form_limiter = _build_limiter()
+
+
+@receiver(setting_changed)
+def reconfigure_form_limiter(setting, **kwargs):
+	# Lets override_settings(FORM_RATE_LIMIT=...) raise or lower the limit for
+	# tests and benchmark runs.
+	if setting in ('FORM_RATE_LIMIT', 'FORM_RATE_LIMIT_WINDOW'):
+		form_limiter.configure(settings.FORM_RATE_LIMIT, settings.FORM_RATE_LIMIT_WINDOW)
+
+
+def client_ip(request):
+	"""
+	Return the client address the rate limits are keyed on.
+
+	Behind FORM_RATE_LIMIT_TRUSTED_PROXIES proxies, each appends the address
+	it saw to X-Forwarded-For, so the client is that many entries from the
+	right. Entries further left come from the client and are not trusted.
+	"""
+	proxies = settings.FORM_RATE_LIMIT_TRUSTED_PROXIES
+	if proxies:
+		forwarded = [entry.strip() for entry in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if entry.strip()]
+		if forwarded:
+			return forwarded[-min(proxies, len(forwarded))]
+	return request.META.get('REMOTE_ADDR', '')
+
+
+def rejection(request, form_name):
+	"""Return the reason to reject a form post before any database work, or None"""
+	data = request.POST
+	if spam_score(data) >= settings.SPAM_SCORE_THRESHOLD:
+		return 'spam'
+	if not form_limiter.allow(f'{form_name}:ip:{client_ip(request)}'):
+		return 'rate'
+	phone = normalize_phone(data.get('phone', ''))
+	if phone and not form_limiter.allow(f'{form_name}:phone:{phone}'):
+		return 'rate'
+	return None
+
+
+def protect_form(redirect_to):
+	"""
+	Reject spammy or too frequent posts to a form view with a message and a
+	redirect to `redirect_to`, without running the view. Works on sync and
+	async views.
+	"""
+	def decorator(view):
+		def reject(request):
+			if request.method != 'POST':
+				return None
+			reason = rejection(request, view.__name__)
+			if reason == 'rate':
+				messages.error(request, 'You have sent several requests in a short time. Please try again in a few minutes.')
+			elif reason:
+				messages.error(request, 'Sorry, we could not accept this request. Please call the showroom instead.')
+			return redirect(redirect_to) if reason else None
+
+		if iscoroutinefunction(view):
+			@wraps(view)
+			async def wrapper(request, *args, **kwargs):
+				# The SQLite limiter backend blocks on its file lock, so check off the event loop.
+				return await sync_to_async(reject)(request) or await view(request, *args, **kwargs)
+		else:
+			@wraps(view)
+			def wrapper(request, *args, **kwargs):
+				return reject(request) or view(request, *args, **kwargs)
+		return wrapper
+	return decorator
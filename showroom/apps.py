@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ShowroomConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'showroom'
+
+    def ready(self):
+        # Register the signal receivers for lead rollups, test-ride slots,
+        # the catalog snapshot, the catalog change feed and bike history.
+        from . import analytics, availability, catalog, changefeed, history  # noqa: F401
+
+        # Time queries and template renders for the profiling middleware.
+        if settings.PERF_PROFILING_ENABLED:
+            from .profiling import install_hooks
+            install_hooks()
@@ -0,0 +1,64 @@
+"""Moving aged leads out of the hot lead tables into ArchivedLead"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import LEAD_TYPES
+from .models import ArchivedLead
+
+# Fields copied into ArchivedLead columns; everything else goes into details.
+COMMON_FIELDS = {'id', 'name', 'email', 'phone', 'bike_slug', 'source', 'customer', 'created_at'}
+
+
+def archive_cutoff(days=None):
+	"""Return the creation time before which leads are archived"""
+	return timezone.now() - timedelta(days=days if days is not None else settings.LEAD_RETENTION_DAYS)
+
+
+def lead_details(lead):
+	"""Return the type-specific fields of a lead, e.g. preferred_date or message"""
+	return {
+		field.attname: getattr(lead, field.attname)
+		for field in lead._meta.concrete_fields
+		if field.name not in COMMON_FIELDS
+	}
+
+
+def _archived_copy(lead, lead_type):
+	return ArchivedLead(
+		lead_type=lead_type,
+		original_id=lead.pk,
+		year=timezone.localtime(lead.created_at).year,
+		name=lead.name,
+		email=getattr(lead, 'email', ''),
+		phone=lead.phone,
+		bike_slug=lead.bike_slug,
+		source=lead.source,
+		customer_id=lead.customer_id,
+		details=lead_details(lead),
+		created_at=lead.created_at,
+	)
+
+
+def archive_leads(cutoff, batch_size=None):
+	"""
+	Move leads created before cutoff into ArchivedLead, oldest first.
+
+	Each batch is copied and deleted in its own short transaction, so the
+	lead tables are never locked for longer than one batch and an interrupted
+	run can simply be restarted. Yields (lead_type, archived_count) per batch.
+	"""
+	batch_size = batch_size or settings.LEAD_ARCHIVE_BATCH_SIZE
+	for model, lead_type in LEAD_TYPES.items():
+		while True:
+			with transaction.atomic():
+				batch = list(model.objects.filter(created_at__lt=cutoff).order_by('created_at', 'id')[:batch_size])
+				if not batch:
+					break
+				ArchivedLead.objects.bulk_create(
+					[_archived_copy(lead, lead_type) for lead in batch], ignore_conflicts=True
+				)
+				model.objects.filter(pk__in=[lead.pk for lead in batch]).delete()
+			yield lead_type, len(batch)
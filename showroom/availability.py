@@ -0,0 +1,157 @@
+"""In-memory test-ride slot availability, kept in sync with TestRideSlot bookings"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .dedupe import create_lead
+from .models import Bike, TestRideRequest, TestRideSlot
+
+
+def slot_times():
+	"""Return the configured daily slot start times, earliest first"""
+	return sorted(datetime.strptime(value, '%H:%M').time() for value in settings.TEST_RIDE_SLOT_TIMES)
+
+
+def slot_start_for(requested_time):
+	"""Return the start of the slot covering requested_time, or None outside opening hours"""
+	length = timedelta(minutes=settings.TEST_RIDE_SLOT_MINUTES)
+	for start in slot_times():
+		begins = datetime.combine(datetime.min, start)
+		if begins <= datetime.combine(datetime.min, requested_time) < begins + length:
+			return start
+	return None
+
+
+def slot_has_started(date, start_time, now=None):
+	"""Return True when the slot on date starting at start_time is under way or over"""
+	now = now or timezone.localtime()
+	return date < now.date() or (date == now.date() and start_time <= now.time())
+
+
+def booking_window(today=None):
+	"""Return the first and last bookable dates"""
+	today = today or timezone.localdate()
+	return today, today + timedelta(days=settings.TEST_RIDE_BOOKING_DAYS - 1)
+
+
+class AvailabilityIndex:
+	"""
+	Remaining demo units per bike, date and slot for the booking window.
+
+	Only slots with bookings are stored; any other slot has the bike's full
+	demo_units free. Bookings made in this process update the index directly,
+	and the whole index is reloaded after TEST_RIDE_INDEX_TTL seconds to pick
+	up bookings and capacity changes made by other workers or in the admin.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._loaded_at = None
+		self._window_start = None
+		self._demo_units = {}
+		self._remaining = {}
+
+	def invalidate(self):
+		with self._lock:
+			self._loaded_at = None
+
+	def _ensure_loaded(self):
+		today = timezone.localdate()
+		with self._lock:
+			fresh = (
+				self._loaded_at is not None
+				and self._window_start == today
+				and time.monotonic() - self._loaded_at < settings.TEST_RIDE_INDEX_TTL
+			)
+			if fresh:
+				return
+			start, end = booking_window(today)
+			demo_units = dict(Bike.objects.filter(is_active=True).values_list('slug', 'demo_units'))
+			remaining = {}
+			slots = TestRideSlot.objects.filter(date__range=(start, end)).values_list(
+				'bike__slug', 'date', 'start_time', 'capacity', 'booked'
+			)
+			for slug, date, start_time, capacity, booked in slots:
+				remaining.setdefault(slug, {}).setdefault(date, {})[start_time] = max(capacity - booked, 0)
+			self._demo_units = demo_units
+			self._remaining = remaining
+			self._window_start = today
+			self._loaded_at = time.monotonic()
+
+	def record(self, bike_slug, slot):
+		"""Store the remaining units of a slot after it was booked in this process"""
+		with self._lock:
+			self._remaining.setdefault(bike_slug, {}).setdefault(slot.date, {})[slot.start_time] = slot.remaining
+
+	def free_slots(self, bike_slug):
+		"""Return [(date, [(start_time, remaining), ...]), ...] of free slots, or None for an unknown bike"""
+		self._ensure_loaded()
+		now = timezone.localtime()
+		with self._lock:
+			if bike_slug not in self._demo_units:
+				return None
+			units = self._demo_units[bike_slug]
+			booked = self._remaining.get(bike_slug, {})
+			start, end = booking_window(self._window_start)
+		days = []
+		times = slot_times()
+		for offset in range((end - start).days + 1):
+			date = start + timedelta(days=offset)
+			day = booked.get(date, {})
+			slots = [
+				(start_time, day.get(start_time, units))
+				for start_time in times
+				if day.get(start_time, units) > 0 and not slot_has_started(date, start_time, now)
+			]
+			if slots:
+				days.append((date, slots))
+		return days
+
+
+availability_index = AvailabilityIndex()
+
+
+def reserve_test_ride(bike, preferred_date, preferred_time, start_time, **request_fields):
+	"""
+	Book one demo unit of bike in the slot and create the TestRideRequest.
+
+	The slot row is claimed with a conditional UPDATE, so concurrent requests
+	can never overbook it, and the request is only matched to a customer once
+	the claim succeeded. Returns the request, or None when the slot is full.
+	"""
+	with transaction.atomic():
+		slot, _ = TestRideSlot.objects.get_or_create(
+			bike=bike, date=preferred_date, start_time=start_time,
+			defaults={'capacity': bike.demo_units},
+		)
+		claimed = TestRideSlot.objects.filter(pk=slot.pk, booked__lt=F('capacity')).update(booked=F('booked') + 1)
+		slot.refresh_from_db(fields=['capacity', 'booked'])
+		if claimed:
+			ride = create_lead(
+				TestRideRequest,
+				bike_slug=bike.slug,
+				preferred_date=preferred_date,
+				preferred_time=preferred_time,
+				slot=slot,
+				**request_fields,
+			)
+		else:
+			ride = None
+	availability_index.record(bike.slug, slot)
+	return ride
+
+
+@receiver(post_delete, sender=TestRideRequest)
+def release_slot(sender, instance, using, **kwargs):
+	"""Give a deleted request's demo unit back to its slot, unless the ride day has passed"""
+	if instance.slot_id is None or instance.preferred_date < timezone.localdate():
+		return
+	TestRideSlot.objects.using(using).filter(pk=instance.slot_id, booked__gt=0).update(booked=F('booked') - 1)
+	transaction.on_commit(availability_index.invalidate, using=using)
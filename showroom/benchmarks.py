@@ -0,0 +1,214 @@
+"""Synthetic data and timing helpers for the showroom benchmark harness"""
+import random
+import statistics
+import time
+from datetime import date, time as dt_time, timedelta
+
+from django.db import connection, transaction
+
+from .availability import availability_index
+from .catalog import catalog_snapshot
+from .changefeed import record_changes
+from .history import record_versions
+from .models import Bike, Branch, ContactInquiry, Offer, ServiceBooking, StockLevel, TestRideRequest
+from .profiling import _percentile
+from .stock import stock_index
+
+FAMILIES = ['Pulsar', 'Dominar', 'Avenger', 'Platina', 'CT', 'Chetak', 'Freedom']
+CC_CATEGORIES = ['100-125cc', '125-150cc', '150-200cc', '200-250cc', '250cc+']
+COLORS = ['Brooklyn Black', 'Racing Red', 'Caribbean Blue', 'Pearl White', 'Volcanic Red']
+
+BULK_BATCH_SIZE = 1000
+
+# Seeded test rides and service bookings are spread over this many days from
+# today; later days have no seeded load.
+LEAD_DAYS = 30
+
+
+def synthetic_bike_payload(index):
+	"""Return a bike in the bikes.json structure, deterministic for a given index"""
+	family = FAMILIES[index % len(FAMILIES)]
+	return {
+		'slug': f'{family.lower()}-bench-{index}',
+		'name': f'{family} Bench {index}',
+		'family': family,
+		'isFeatured': index % 10 == 0,
+		'heroImage': 'assets/images/one.webp',
+		'gallery': ['assets/images/two.webp', 'assets/images/three.webp'],
+		'engine': {
+			'cc': 100 + index % 300,
+			'ccCategory': CC_CATEGORIES[index % len(CC_CATEGORIES)],
+			'power': '15.7 PS @ 8,750 rpm',
+			'torque': '14.65 Nm @ 6,750 rpm',
+			'cooling': 'Oil cooled',
+			'transmission': '5-speed',
+		},
+		'performance': {
+			'mileage': '45 kmpl (claimed)',
+			'topSpeed': '120 km/h',
+			'summary': 'Synthetic benchmark bike.',
+		},
+		'chassis': {
+			'frontBrake': '280 mm Disc',
+			'rearBrake': '230 mm Disc',
+			'suspension': 'Telescopic (front), Mono-shock (rear)',
+			'weight': '152 kg',
+			'seatHeight': '795 mm',
+		},
+		'colors': COLORS[:1 + index % len(COLORS)],
+		'price': {
+			'exShowroom': 70000 + index * 10,
+			'onRoad': 85000 + index * 10,
+			'emi': '₹3,599/month',
+		},
+		'features': ['LED headlamp', 'Digital console', 'USB charging'],
+	}
+
+
+def _bike_from_payload(payload):
+	return Bike(
+		slug=payload['slug'],
+		name=payload['name'],
+		family=payload['family'],
+		is_featured=payload['isFeatured'],
+		hero_image=payload['heroImage'],
+		gallery_images=', '.join(payload['gallery']),
+		engine_cc=payload['engine']['cc'],
+		cc_category=payload['engine']['ccCategory'],
+		power=payload['engine']['power'],
+		torque=payload['engine']['torque'],
+		cooling=payload['engine']['cooling'],
+		transmission=payload['engine']['transmission'],
+		mileage=payload['performance']['mileage'],
+		top_speed=payload['performance']['topSpeed'],
+		performance_summary=payload['performance']['summary'],
+		front_brake=payload['chassis']['frontBrake'],
+		rear_brake=payload['chassis']['rearBrake'],
+		suspension=payload['chassis']['suspension'],
+		weight=payload['chassis']['weight'],
+		seat_height=payload['chassis']['seatHeight'],
+		colors=', '.join(payload['colors']),
+		ex_showroom_price=payload['price']['exShowroom'],
+		on_road_price=payload['price']['onRoad'],
+		emi=payload['price']['emi'],
+		features=', '.join(payload['features']),
+	)
+
+
+def seed_catalog(bike_count, offer_count=None):
+	"""
+	Replace the catalog with bike_count synthetic bikes, one offer per ten
+	bikes, and stock of every colour at two branches
+	"""
+	if offer_count is None:
+		offer_count = max(1, bike_count // 10)
+	today = date.today()
+	with transaction.atomic():
+		Offer.objects.all().delete()
+		Bike.objects.all().delete()
+		bikes = Bike.objects.bulk_create(
+			[_bike_from_payload(synthetic_bike_payload(i)) for i in range(bike_count)],
+			batch_size=BULK_BATCH_SIZE,
+		)
+		offers = Offer.objects.bulk_create(
+			[
+				Offer(
+					title=f'Bench offer {i}',
+					description='Synthetic benchmark offer',
+					bike=bikes[i % len(bikes)] if bikes and i % 3 else None,
+					discount_amount=1000 + i,
+					valid_from=today - timedelta(days=7),
+					valid_until=today + timedelta(days=7),
+				)
+				for i in range(offer_count)
+			],
+			batch_size=BULK_BATCH_SIZE,
+		)
+		branches = [
+			Branch.objects.get_or_create(slug=slug, defaults={'name': name})[0]
+			for slug, name in (('bench-main', 'Bench Main'), ('bench-east', 'Bench East'))
+		]
+		StockLevel.objects.bulk_create(
+			[
+				StockLevel(bike=bike, branch=branch, colour=colour, units=(i + j) % 3)
+				for i, bike in enumerate(bikes)
+				for j, colour in enumerate(bike.get_colors_list())
+				for branch in branches
+			],
+			batch_size=BULK_BATCH_SIZE,
+		)
+		record_changes(bikes + offers)
+		record_versions(bikes)
+	availability_index.invalidate()
+	stock_index.invalidate()
+	catalog_snapshot.invalidate()
+	return bikes
+
+
+def seed_leads(lead_count, slugs):
+	"""Insert lead_count rows into each of the three lead tables"""
+	rng = random.Random(lead_count)
+	today = date.today()
+	for model, build in (
+		(TestRideRequest, lambda i, slug: TestRideRequest(
+			name=f'Lead {i}', email=f'lead{i}@example.com', phone=f'98{i:08d}', bike_slug=slug,
+			preferred_date=today + timedelta(days=i % LEAD_DAYS), preferred_time=dt_time(10 + i % 8, 0),
+		)),
+		(ContactInquiry, lambda i, slug: ContactInquiry(
+			name=f'Lead {i}', email=f'lead{i}@example.com', phone=f'98{i:08d}', bike_slug=slug,
+			message='Please call me back.',
+		)),
+		(ServiceBooking, lambda i, slug: ServiceBooking(
+			name=f'Lead {i}', phone=f'98{i:08d}', bike_slug=slug,
+			preferred_date=today + timedelta(days=i % LEAD_DAYS),
+		)),
+	):
+		model.objects.all().delete()
+		model.objects.bulk_create(
+			[build(i, rng.choice(slugs)) for i in range(lead_count)],
+			batch_size=BULK_BATCH_SIZE,
+		)
+
+
+def measure(func, iterations):
+	"""Call func repeatedly and return latency percentiles (ms) and the query count of the last call"""
+	timings = []
+	queries = 0
+
+	def count(execute, sql, params, many, context):
+		nonlocal queries
+		queries += 1
+		return execute(sql, params, many, context)
+
+	for _ in range(iterations):
+		# Counted with a wrapper rather than connection.queries, which stops
+		# growing at 9000 entries and would report a large import as 0 queries.
+		queries = 0
+		with connection.execute_wrapper(count):
+			started = time.perf_counter()
+			func()
+			timings.append((time.perf_counter() - started) * 1000)
+	timings.sort()
+	return {
+		'p50_ms': round(_percentile(timings, 50), 3),
+		'p95_ms': round(_percentile(timings, 95), 3),
+		'p99_ms': round(_percentile(timings, 99), 3),
+		'mean_ms': round(statistics.fmean(timings), 3),
+		'queries': queries,
+	}
+
+
+def compare(results, baseline, threshold):
+	"""Return a list of regressions of results against baseline, as readable strings"""
+	regressions = []
+	for size, entries in results.items():
+		for name, current in entries.items():
+			previous = baseline.get(size, {}).get(name)
+			if not previous:
+				continue
+			if current['queries'] > previous['queries']:
+				regressions.append(f'{size}/{name}: {previous["queries"]} -> {current["queries"]} queries')
+			limit = previous['p95_ms'] * (1 + threshold)
+			if current['p95_ms'] > limit:
+				regressions.append(f'{size}/{name}: p95 {previous["p95_ms"]}ms -> {current["p95_ms"]}ms')
+	return regressions
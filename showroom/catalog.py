@@ -0,0 +1,115 @@
+"""In-process snapshot of the active catalog, shared by the pages, forms and bikes.json"""
+import json
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Bike
+from .stock import stock_index
+
+# bikes maps slug to the bike's payload in catalog order, choices lists
+# {'slug', 'name'} by name for the forms, and bikes_json is the encoded
+# /api/bikes.json body.
+Catalog = namedtuple('Catalog', ['bikes', 'choices', 'bikes_json'])
+
+
+def _bike_to_dict(bike, with_stock=True):
+	"""Convert a Bike model instance to a dictionary matching the JSON structure"""
+	data = {
+		'slug': bike.slug,
+		'name': bike.name,
+		'family': bike.family or '',
+		'isFeatured': bike.is_featured,
+		'heroImage': bike.hero_image or '',
+		'gallery': bike.get_gallery_list(),
+		'engine': {
+			'cc': float(bike.engine_cc) if bike.engine_cc else 0,
+			'ccCategory': bike.cc_category or '',
+			'power': bike.power or '',
+			'torque': bike.torque or '',
+			'cooling': bike.cooling or '',
+			'transmission': bike.transmission or '',
+		},
+		'performance': {
+			'mileage': bike.mileage or '',
+			'topSpeed': bike.top_speed or '',
+			'summary': bike.performance_summary or '',
+		},
+		'chassis': {
+			'frontBrake': bike.front_brake or '',
+			'rearBrake': bike.rear_brake or '',
+			'suspension': bike.suspension or '',
+			'weight': bike.weight or '',
+			'seatHeight': bike.seat_height or '',
+		},
+		'colors': bike.get_colors_list(),
+		'price': {
+			'exShowroom': float(bike.ex_showroom_price) if bike.ex_showroom_price else 0,
+			'onRoad': float(bike.on_road_price) if bike.on_road_price else 0,
+			'emi': bike.emi or '',
+		},
+		'features': bike.get_features_list(),
+	}
+	if with_stock:
+		data['stock'] = stock_index.availability(bike.slug, data['colors'])
+	return data
+
+
+def build_catalog():
+	"""Load the active bikes and serialize everything served from them, in one query plus the stock index"""
+	bikes = {bike.slug: _bike_to_dict(bike) for bike in Bike.objects.filter(is_active=True)}
+	choices = sorted(({'slug': slug, 'name': bike['name']} for slug, bike in bikes.items()), key=lambda choice: choice['name'])
+	bikes_json = json.dumps({'bikes': list(bikes.values())}, cls=DjangoJSONEncoder).encode('utf-8')
+	return Catalog(bikes, choices, bikes_json)
+
+
+class CatalogSnapshot:
+	"""
+	The current Catalog, rebuilt after CATALOG_SNAPSHOT_TTL seconds.
+
+	Saving or deleting a bike in this process drops the snapshot once the
+	write commits, so a rebuild cannot cache rows that are still uncommitted
+	or later rolled back; like the availability index, edits made by other
+	workers show up once their snapshot expires.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._loaded_at = None
+		self._catalog = None
+
+	def invalidate(self):
+		with self._lock:
+			self._loaded_at = None
+
+	def _fresh(self):
+		return self._loaded_at is not None and time.monotonic() - self._loaded_at < settings.CATALOG_SNAPSHOT_TTL
+
+	def get(self):
+		with self._lock:
+			if not self._fresh():
+				self._catalog = build_catalog()
+				self._loaded_at = time.monotonic()
+			return self._catalog
+
+	async def aget(self):
+		"""Async variant of get() that only leaves the event loop to rebuild"""
+		if self._fresh():
+			return self._catalog
+		return await sync_to_async(self.get)()
+
+
+catalog_snapshot = CatalogSnapshot()
+
+
+@receiver(post_save, sender=Bike)
+@receiver(post_delete, sender=Bike)
+def drop_catalog_snapshot(sender, using, **kwargs):
+	transaction.on_commit(catalog_snapshot.invalidate, using=using)
@@ -0,0 +1,103 @@
+"""Versioned log of bike and offer changes, for clients syncing the catalog in deltas"""
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Bike, CatalogChange, Offer
+
+CHANGE_KINDS = {
+	Bike: 'bike',
+	Offer: 'offer',
+}
+
+
+def _change_key(instance):
+	return instance.slug if isinstance(instance, Bike) else str(instance.pk)
+
+
+def record_changes(instances, action='upsert'):
+	"""
+	Append one change per bike or offer in instances.
+
+	Saves and deletes are recorded by the signal receivers below; call this
+	after bulk_create, bulk_update or queryset updates, which bypass them.
+	"""
+	CatalogChange.objects.bulk_create([
+		CatalogChange(
+			kind=CHANGE_KINDS[type(instance)], object_id=instance.pk, key=_change_key(instance), action=action,
+		)
+		for instance in instances
+	])
+
+
+@receiver(post_init, sender=Bike)
+def remember_bike_slug(sender, instance, **kwargs):
+	# Read from __dict__ so a deferred slug is not loaded for every bike.
+	instance._feed_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Bike)
+def record_bike_rename(sender, instance, created, **kwargs):
+	# Clients know bikes by slug, so a renamed bike retires its old slug
+	# with a delete alongside the upsert under the new one.
+	old_slug = getattr(instance, '_feed_slug', None)
+	if not created and old_slug and old_slug != instance.slug:
+		CatalogChange.objects.create(kind='bike', object_id=instance.pk, key=old_slug, action='delete')
+	instance._feed_slug = instance.slug
+
+
+@receiver(post_save, sender=Bike)
+@receiver(post_save, sender=Offer)
+def record_save(sender, instance, **kwargs):
+	record_changes([instance])
+
+
+@receiver(post_delete, sender=Bike)
+@receiver(post_delete, sender=Offer)
+def record_delete(sender, instance, **kwargs):
+	record_changes([instance], action='delete')
+
+
+def latest_version():
+	return CatalogChange.objects.aggregate(version=Max('version'))['version'] or 0
+
+
+def changes_since(version):
+	"""
+	Return (latest_version, {kind: {key: (object_id, action)}}) for changes after version.
+
+	Only the latest change per key is kept, so an object saved ten times
+	since version is reported once, and a renamed bike reports its old slug
+	as deleted and its new one as upserted. With no changes the version is
+	unchanged; None means version is ahead of the log and the client must
+	start over.
+	"""
+	latest = version
+	changes = {kind: {} for kind in CHANGE_KINDS.values()}
+	for change_version, kind, object_id, key, action in CatalogChange.objects.filter(version__gt=version).values_list(
+		'version', 'kind', 'object_id', 'key', 'action'
+	):
+		changes[kind][key] = (object_id, action)
+		latest = change_version
+	if latest == version and version > latest_version():
+		return None, changes
+	return latest, changes
+
+
+def compact_changes():
+	"""
+	Delete every change that a later change to the same key supersedes.
+
+	Deltas only ever report the latest change per key, so compaction does
+	not alter any answer. Tombstones are kept, so a client can catch up from
+	any version, and the log stays bounded by the number of bike slugs and
+	offers ever used. Returns the number of changes removed.
+	"""
+	latest = (
+		CatalogChange.objects.order_by()
+		.values('kind', 'key')
+		.annotate(latest=Max('version'))
+		.values('latest')
+	)
+	removed, _ = CatalogChange.objects.exclude(version__in=latest).delete()
+	return removed
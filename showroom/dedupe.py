@@ -0,0 +1,267 @@
+"""Matching leads from the three lead tables to the customers behind them"""
+import hashlib
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import ArchivedLead, ContactInquiry, Customer, CustomerContactKey, ServiceBooking, TestRideRequest
+
+LEAD_MODELS = (TestRideRequest, ContactInquiry, ServiceBooking)
+# Every table holding leads that point at a customer, archived ones included.
+CUSTOMER_LEAD_MODELS = LEAD_MODELS + (ArchivedLead,)
+
+_NON_DIGITS = re.compile(r'\D')
+_GMAIL_DOMAINS = {'gmail.com', 'googlemail.com'}
+
+
+def normalize_phone(phone):
+	"""Return the 10-digit Indian mobile number in phone, or '' if it has none"""
+	digits = _NON_DIGITS.sub('', phone or '')
+	# Drop the +91 / 0091 country code or a trunk 0 in front of the number.
+	if len(digits) > 10 and (digits.startswith('91') or digits.startswith('0')):
+		digits = digits[-10:]
+	return digits if len(digits) == 10 else ''
+
+
+def normalize_email(email):
+	"""Return email lowercased, without a +tag, and without dots for Gmail addresses"""
+	email = (email or '').strip().lower()
+	local, _, domain = email.partition('@')
+	if not local or not domain:
+		return ''
+	local = local.split('+', 1)[0]
+	if domain in _GMAIL_DOMAINS:
+		local = local.replace('.', '')
+		domain = 'gmail.com'
+	return f'{local}@{domain}'
+
+
+def contact_keys(phone, email):
+	"""Return the hashed contact keys for a phone number and email address"""
+	keys = []
+	phone = normalize_phone(phone)
+	email = normalize_email(email)
+	if phone:
+		keys.append(_hash(f'phone:{phone}'))
+	if email:
+		keys.append(_hash(f'email:{email}'))
+	return keys
+
+
+def _hash(value):
+	return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def match_customer(name, phone, email=''):
+	"""
+	Return the customer owning phone or email, creating one if neither is known.
+
+	Lookup is a single indexed query on the hashed contact keys. When the two
+	keys belong to different customers, this lead proves they are the same
+	person, so the later customer is merged into the earliest one.
+	"""
+	keys = contact_keys(phone, email)
+	if not keys:
+		return None
+	try:
+		with transaction.atomic():
+			return _match_keys(name, phone, email, keys)
+	except IntegrityError:
+		# A concurrent first submission from the same person claimed one of
+		# the keys after our lookup; its customer is committed now, so match
+		# again and pick it up instead of keeping a second customer.
+		with transaction.atomic():
+			return _match_keys(name, phone, email, keys)
+
+
+def _match_keys(name, phone, email, keys):
+	known = {
+		contact_key.key: contact_key.customer_id
+		for contact_key in CustomerContactKey.objects.filter(key__in=keys)
+	}
+	customer_ids = sorted(set(known.values()))
+	if not customer_ids:
+		customer = Customer.objects.create(
+			name=name, phone=normalize_phone(phone), email=normalize_email(email)
+		)
+	else:
+		customer = Customer.objects.get(pk=customer_ids[0])
+		if len(customer_ids) > 1:
+			merge_customers(customer, customer_ids[1:])
+	missing = [key for key in keys if key not in known]
+	if missing:
+		CustomerContactKey.objects.bulk_create([CustomerContactKey(key=key, customer=customer) for key in missing])
+	return customer
+
+
+def create_lead(model, **fields):
+	"""
+	Create a lead of model linked to its customer, in one transaction.
+
+	Views that claim capacity first (test-ride slots, service days) call this
+	only once the claim succeeded, so a rejected request never creates or
+	merges customers.
+	"""
+	with transaction.atomic(savepoint=False):
+		customer = match_customer(fields.get('name', ''), fields.get('phone', ''), fields.get('email', ''))
+		return model.objects.create(customer=customer, **fields)
+
+
+def merge_customers(customer, duplicate_ids):
+	"""Move every lead and contact key of duplicate_ids onto customer and delete the duplicates"""
+	for model in CUSTOMER_LEAD_MODELS:
+		model.objects.filter(customer_id__in=duplicate_ids).update(customer=customer)
+	CustomerContactKey.objects.filter(customer_id__in=duplicate_ids).update(customer=customer)
+	Customer.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class DisjointSet:
+	"""Union-find with path halving and union by size"""
+
+	def __init__(self):
+		self.parent = {}
+		self.size = {}
+
+	def find(self, item):
+		if item not in self.parent:
+			self.parent[item] = item
+			self.size[item] = 1
+		while self.parent[item] != item:
+			self.parent[item] = self.parent[self.parent[item]]
+			item = self.parent[item]
+		return item
+
+	def union(self, a, b):
+		a, b = self.find(a), self.find(b)
+		if a == b:
+			return a
+		if self.size[a] < self.size[b]:
+			a, b = b, a
+		self.parent[b] = a
+		self.size[a] += self.size[b]
+		return a
+
+
+def cluster_leads():
+	"""
+	Group every lead, archived ones included, into customers by shared phone or email.
+
+	Returns a list of clusters, each a list of (model, lead_id, name, phone,
+	email) tuples ordered oldest first. Leads sharing a contact key are
+	unioned, so A-B by phone and B-C by email end up in one cluster. Leads
+	without a usable phone or email are left out.
+	"""
+	leads = []
+	for model in CUSTOMER_LEAD_MODELS:
+		has_email = any(field.name == 'email' for field in model._meta.fields)
+		fields = ['created_at', 'id', 'name', 'phone'] + (['email'] if has_email else [])
+		for row in model.objects.order_by().values_list(*fields):
+			created_at, lead_id, name, phone = row[:4]
+			email = row[4] if has_email else ''
+			keys = contact_keys(phone, email)
+			if keys:
+				leads.append((created_at, keys, (model, lead_id, name, phone, email)))
+	leads.sort(key=lambda lead: lead[0])
+
+	clusters = DisjointSet()
+	owner_of_key = {}
+	for index, (_, keys, _) in enumerate(leads):
+		clusters.find(index)
+		for key in keys:
+			if key in owner_of_key:
+				clusters.union(owner_of_key[key], index)
+			else:
+				owner_of_key[key] = index
+
+	grouped = {}
+	for index, (_, _, lead) in enumerate(leads):
+		grouped.setdefault(clusters.find(index), []).append(lead)
+	return list(grouped.values())
+
+
+def _customer_details(cluster):
+	"""Name the customer after their latest lead and keep the first phone and email seen"""
+	phone = next((normalize_phone(lead[3]) for lead in cluster if normalize_phone(lead[3])), '')
+	email = next((normalize_email(lead[4]) for lead in cluster if normalize_email(lead[4])), '')
+	return {'name': cluster[-1][2], 'phone': phone, 'email': email}
+
+
+def link_clusters(clusters, batch_size):
+	"""
+	Point every lead of each cluster from cluster_leads() at one customer.
+
+	Clusters are written batch_size at a time, each batch in its own short
+	transaction, so form posts only wait for one batch and keep matching
+	through the contact keys in between. A cluster keeps the oldest customer
+	its leads already point at and only gets a new one when none is left;
+	customers no lead points at afterwards are removed by
+	delete_orphan_customers(). Yields the number of clusters linked per batch.
+	"""
+	claimed = set()
+	for start in range(0, len(clusters), batch_size):
+		batch = clusters[start:start + batch_size]
+		with transaction.atomic():
+			# Read the current links inside the transaction: form posts since
+			# cluster_leads() may have merged customers away.
+			current = {}
+			for model in CUSTOMER_LEAD_MODELS:
+				ids = [lead[1] for cluster in batch for lead in cluster if lead[0] is model]
+				current.update(
+					((model, lead_id), customer_id)
+					for lead_id, customer_id in model.objects.filter(pk__in=ids).values_list('id', 'customer_id')
+				)
+
+			customers = []
+			for cluster in batch:
+				linked = sorted(
+					{current.get((lead[0], lead[1])) for lead in cluster} - {None} - claimed
+				)
+				if linked:
+					claimed.add(linked[0])
+				customers.append(Customer(pk=linked[0] if linked else None, **_customer_details(cluster)))
+			Customer.objects.bulk_update([customer for customer in customers if customer.pk], ['name', 'phone', 'email'])
+			claimed.update(customer.pk for customer in Customer.objects.bulk_create(
+				[customer for customer in customers if not customer.pk]
+			))
+
+			keys = {}
+			leads = {model: [] for model in CUSTOMER_LEAD_MODELS}
+			for customer, cluster in zip(customers, batch):
+				for model, lead_id, name, phone, email in cluster:
+					for key in contact_keys(phone, email):
+						keys.setdefault(key, customer.pk)
+					if current.get((model, lead_id)) != customer.pk:
+						leads[model].append(model(id=lead_id, customer_id=customer.pk))
+			for model, rows in leads.items():
+				model.objects.bulk_update(rows, ['customer'])
+
+			existing = {
+				contact_key.key: contact_key
+				for contact_key in CustomerContactKey.objects.filter(key__in=list(keys))
+			}
+			moved = []
+			for key, customer_id in keys.items():
+				if key in existing and existing[key].customer_id != customer_id:
+					existing[key].customer_id = customer_id
+					moved.append(existing[key])
+			CustomerContactKey.objects.bulk_update(moved, ['customer'])
+			CustomerContactKey.objects.bulk_create(
+				[CustomerContactKey(key=key, customer_id=customer_id) for key, customer_id in keys.items() if key not in existing]
+			)
+		yield len(batch)
+
+
+def delete_orphan_customers(batch_size):
+	"""Delete customers that no lead points at, batch_size per transaction, and return how many went"""
+	orphans = Customer.objects.order_by()
+	for model in CUSTOMER_LEAD_MODELS:
+		orphans = orphans.exclude(Exists(model.objects.filter(customer=OuterRef('pk'))))
+	deleted = 0
+	while True:
+		with transaction.atomic():
+			ids = list(orphans.values_list('pk', flat=True)[:batch_size])
+			if not ids:
+				return deleted
+			Customer.objects.filter(pk__in=ids).delete()
+		deleted += len(ids)
@@ -0,0 +1,120 @@
+"""Append-only price and spec history of bikes, stored as periodic snapshots plus diffs"""
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Bike, BikeVersion
+
+HISTORY_FIELDS = [field for field in Bike._meta.concrete_fields if field.name not in {'id', 'created_at', 'updated_at'}]
+
+
+def stored_value(field, value):
+	"""Return value in the form history stores it; decimals always carry the field's decimal places"""
+	value = field.to_python(value)
+	if value is not None and field.get_internal_type() == 'DecimalField':
+		return format(value, f'.{field.decimal_places}f')
+	return value
+
+
+def _field_values(bike):
+	return {field.name: stored_value(field, field.value_from_object(bike)) for field in HISTORY_FIELDS}
+
+
+def _same(field, stored, current):
+	# Stored values went through JSON, so compare them as the field's Python type.
+	return field.to_python(stored) == field.to_python(current)
+
+
+def bike_states(bike_pks=None, as_of=None):
+	"""
+	Return {bike_pk: (values, is_deleted, diffs_since_snapshot)} as of a moment.
+
+	A single query reads, for each bike, its latest snapshot at or before
+	as_of and the diffs recorded after it, so reconstruction never replays
+	more than BIKE_HISTORY_SNAPSHOT_EVERY entries per bike however long the
+	history grows. Stored values are JSON: decimals are strings with the
+	field's decimal places, e.g. '131000.00'.
+	"""
+	versions = BikeVersion.objects.all()
+	snapshots = BikeVersion.objects.filter(bike_pk=OuterRef('bike_pk'), is_snapshot=True)
+	if as_of is not None:
+		versions = versions.filter(recorded_at__lte=as_of)
+		snapshots = snapshots.filter(recorded_at__lte=as_of)
+	if bike_pks is not None:
+		versions = versions.filter(bike_pk__in=bike_pks)
+	versions = versions.filter(id__gte=Subquery(snapshots.order_by('-id').values('id')[:1]))
+
+	states = {}
+	for bike_pk, is_snapshot, is_deleted, values in versions.order_by('bike_pk', 'id').values_list(
+		'bike_pk', 'is_snapshot', 'is_deleted', 'values'
+	):
+		if is_snapshot:
+			states[bike_pk] = (dict(values), is_deleted, 0)
+		else:
+			current, _, diffs = states[bike_pk]
+			current.update(values)
+			states[bike_pk] = (current, is_deleted, diffs + 1)
+	return states
+
+
+def record_versions(bikes, deleted=False):
+	"""
+	Append a history entry for each bike whose fields differ from its last entry.
+
+	Saves and deletes are recorded by the signal receivers below; call this
+	after bulk_update or queryset updates, which bypass them. Every
+	BIKE_HISTORY_SNAPSHOT_EVERY entries a bike gets a full snapshot instead
+	of a diff. Returns the number of entries written.
+	"""
+	states = bike_states([bike.pk for bike in bikes])
+	now = timezone.now()
+	versions = []
+	for bike in bikes:
+		values = _field_values(bike)
+		previous, was_deleted, diffs = states.get(bike.pk, (None, False, 0))
+		if previous is None or was_deleted or diffs + 1 >= settings.BIKE_HISTORY_SNAPSHOT_EVERY:
+			changed, is_snapshot = values, True
+		else:
+			changed = {
+				field.name: values[field.name]
+				for field in HISTORY_FIELDS
+				if field.name not in previous or not _same(field, previous[field.name], values[field.name])
+			}
+			is_snapshot = False
+		if changed or deleted:
+			versions.append(BikeVersion(
+				bike_pk=bike.pk, slug=bike.slug, is_snapshot=is_snapshot, is_deleted=deleted,
+				values=changed, recorded_at=now,
+			))
+	BikeVersion.objects.bulk_create(versions)
+	return len(versions)
+
+
+@receiver(post_save, sender=Bike)
+def record_bike_save(sender, instance, **kwargs):
+	record_versions([instance])
+
+
+@receiver(post_delete, sender=Bike)
+def record_bike_delete(sender, instance, **kwargs):
+	record_versions([instance], deleted=True)
+
+
+def bike_from_values(bike_pk, values):
+	"""Return an unsaved Bike holding historical field values"""
+	return Bike(pk=bike_pk, **{field.attname: field.to_python(values[field.name]) for field in HISTORY_FIELDS if field.name in values})
+
+
+def catalog_as_of(moment, bike_slug=None):
+	"""Return the bikes that were active at moment, with their fields as they were then"""
+	bikes = []
+	for bike_pk, (values, is_deleted, _) in bike_states(as_of=moment).items():
+		if is_deleted or not values.get('is_active', True):
+			continue
+		if bike_slug and values.get('slug') != bike_slug:
+			continue
+		bikes.append(bike_from_values(bike_pk, values))
+	bikes.sort(key=lambda bike: (not bike.is_featured, bike.name))
+	return bikes
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from showroom.analytics import LEAD_TYPES
+from showroom.archival import archive_cutoff, archive_leads
+
+
+class Command(BaseCommand):
+	help = 'Move test ride, inquiry and service leads older than the retention period into the lead archive'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--days', type=int, default=settings.LEAD_RETENTION_DAYS, help='Archive leads older than this many days')
+		parser.add_argument('--batch-size', type=int, default=settings.LEAD_ARCHIVE_BATCH_SIZE, help='Leads moved per transaction')
+		parser.add_argument('--dry-run', action='store_true', help='Only count the leads that would be archived')
+
+	def handle(self, *args, **options):
+		cutoff = archive_cutoff(options['days'])
+		if options['dry_run']:
+			for model, lead_type in LEAD_TYPES.items():
+				count = model.objects.filter(created_at__lt=cutoff).count()
+				self.stdout.write(f'{lead_type}: {count} leads older than {cutoff:%Y-%m-%d}')
+			return
+
+		totals = {}
+		for lead_type, count in archive_leads(cutoff, options['batch_size']):
+			totals[lead_type] = totals.get(lead_type, 0) + count
+		for lead_type, count in totals.items():
+			self.stdout.write(f'{lead_type}: archived {count} leads')
+		self.stdout.write(self.style.SUCCESS(f'Archived {sum(totals.values())} leads created before {cutoff:%Y-%m-%d}'))
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from showroom.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+	help = 'Recount the daily lead rollups from the test ride, inquiry, service and archived lead tables'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--start', help='First day to recount (YYYY-MM-DD, default all history)')
+		parser.add_argument('--end', help='Last day to recount (YYYY-MM-DD, default all history)')
+
+	def handle(self, *args, **options):
+		try:
+			start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+			end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+		except ValueError:
+			raise CommandError('--start and --end must be dates in YYYY-MM-DD format')
+
+		rows = rebuild_rollups(start, end)
+		self.stdout.write(self.style.SUCCESS(f'Wrote {rows} rollup rows'))
@@ -0,0 +1,147 @@
+import itertools
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from showroom import benchmarks
+from showroom.availability import slot_times
+from showroom.urls import urlpatterns
+
+
+def _test_ride_slot(iteration):
+	# A new slot every iteration, from tomorrow onwards, so each post books a
+	# free demo unit instead of hitting a full slot.
+	times = slot_times()
+	day = timezone.localdate() + timedelta(days=1 + iteration // len(times))
+	return day.isoformat(), times[iteration % len(times)].strftime('%H:%M')
+
+
+# URL names that take a form POST instead of a GET, with a valid payload for
+# the given iteration. Every post is accepted, so the booking path is timed.
+FORM_POSTS = {
+	'test_ride_submit': lambda slug, iteration: {
+		'model': slug, 'date': _test_ride_slot(iteration)[0], 'time': _test_ride_slot(iteration)[1],
+		'name': 'Bench Rider', 'email': 'bench@example.com', 'phone': '9800000000',
+	},
+	'contact_submit': lambda slug, iteration: {
+		'model': slug, 'name': 'Bench Rider', 'email': 'bench@example.com',
+		'phone': '9800000000', 'message': 'Benchmark inquiry',
+	},
+	# One booking per day after the seeded load, so no day fills up.
+	'service_submit': lambda slug, iteration: {
+		'model': slug, 'date': (timezone.localdate() + timedelta(days=benchmarks.LEAD_DAYS + iteration)).isoformat(),
+		'name': 'Bench Rider', 'phone': '9800000000',
+	},
+}
+
+# Query strings for GET URLs that need one.
+QUERY_PARAMS = {
+	'test_ride_slots': lambda slug: {'bike': slug},
+}
+
+
+class Command(BaseCommand):
+	help = 'Benchmark showroom URLs, form submissions and import_bikes against synthetic catalogs'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--sizes', default='20,1000,10000', help='Comma-separated catalog sizes to seed')
+		parser.add_argument('--leads', type=int, default=10000, help='Rows to seed in each lead table')
+		parser.add_argument('--iterations', type=int, default=20, help='Requests per URL and size')
+		parser.add_argument('--baseline', default='benchmarks/baseline.json', help='Baseline JSON to compare against')
+		parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p95 slowdown over the baseline (0.25 = 25%%)')
+		parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+		parser.add_argument('--output', help='Also write the results JSON to this path')
+
+	def handle(self, *args, **options):
+		sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+
+		# Run against throwaway test databases so the real data is never touched.
+		setup_test_environment()
+		old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=())
+		try:
+			# Every form post comes from one client, so lift the rate limit while
+			# still paying for the bucket lookups.
+			with override_settings(FORM_RATE_LIMIT=10 ** 9):
+				results = {str(size): self._run_size(size, options) for size in sizes}
+		finally:
+			teardown_databases(old_config, verbosity=0)
+			teardown_test_environment()
+
+		if options['output']:
+			self._write(options['output'], results)
+
+		baseline_path = options['baseline']
+		if options['save_baseline']:
+			self._write(baseline_path, results)
+			self.stdout.write(self.style.SUCCESS(f'Baseline saved: {baseline_path}'))
+			return
+
+		if not os.path.exists(baseline_path):
+			self.stdout.write(self.style.WARNING(f'No baseline at {baseline_path}; run with --save-baseline first'))
+			return
+
+		with open(baseline_path, 'r', encoding='utf-8') as f:
+			baseline = json.load(f)
+		regressions = benchmarks.compare(results, baseline, options['threshold'])
+		if regressions:
+			raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+		self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+	def _run_size(self, size, options):
+		self.stdout.write(self.style.MIGRATE_HEADING(f'\nCatalog size {size}'))
+		bikes = benchmarks.seed_catalog(size)
+		slugs = [bike.slug for bike in bikes]
+		benchmarks.seed_leads(options['leads'], slugs)
+
+		client = Client()
+		sample_slug = slugs[len(slugs) // 2]
+		entries = {}
+		for pattern in urlpatterns:
+			kwargs = {'slug': sample_slug} if 'slug' in pattern.pattern.converters else {}
+			url = reverse(pattern.name, kwargs=kwargs)
+			if pattern.name in FORM_POSTS:
+				payload = FORM_POSTS[pattern.name]
+				iteration = itertools.count()
+				entries[pattern.name] = benchmarks.measure(
+					lambda: client.post(url, payload(sample_slug, next(iteration))), options['iterations']
+				)
+			else:
+				params = QUERY_PARAMS[pattern.name](sample_slug) if pattern.name in QUERY_PARAMS else {}
+				entries[pattern.name] = benchmarks.measure(lambda: client.get(url, params), options['iterations'])
+			self._report(pattern.name, entries[pattern.name])
+
+		entries['import_bikes'] = self._measure_import(size)
+		self._report('import_bikes', entries['import_bikes'])
+		return entries
+
+	def _measure_import(self, size):
+		fd, path = tempfile.mkstemp(suffix='.json')
+		try:
+			with os.fdopen(fd, 'w', encoding='utf-8') as f:
+				json.dump({'bikes': [benchmarks.synthetic_bike_payload(i) for i in range(size)]}, f)
+			# Every row already exists, so this times the update path of a re-import.
+			return benchmarks.measure(lambda: call_command('import_bikes', file=path, stdout=StringIO()), 1)
+		finally:
+			os.remove(path)
+
+	def _report(self, name, entry):
+		self.stdout.write(
+			f'  {name:<20} p50 {entry["p50_ms"]:>9.2f}ms  p95 {entry["p95_ms"]:>9.2f}ms  '
+			f'p99 {entry["p99_ms"]:>9.2f}ms  {entry["queries"]:>6} queries'
+		)
+
+	def _write(self, path, results):
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(path, 'w', encoding='utf-8') as f:
+			json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from showroom.changefeed import compact_changes
+
+
+class Command(BaseCommand):
+	help = 'Drop catalog change feed entries superseded by a later change to the same bike or offer'
+
+	def handle(self, *args, **options):
+		removed = compact_changes()
+		self.stdout.write(self.style.SUCCESS(f'Removed {removed} superseded changes'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from showroom.dedupe import cluster_leads, delete_orphan_customers, link_clusters
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+	help = 'Cluster all test ride, inquiry and service leads, archived ones included, into customers by phone and email'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Customers written per transaction')
+		parser.add_argument('--dry-run', action='store_true', help='Report the clusters without saving them')
+
+	def handle(self, *args, **options):
+		clusters = cluster_leads()
+		lead_count = sum(len(cluster) for cluster in clusters)
+		duplicates = sum(1 for cluster in clusters if len(cluster) > 1)
+		self.stdout.write(f'{lead_count} leads belong to {len(clusters)} customers ({duplicates} with more than one lead)')
+		if options['dry_run']:
+			return
+
+		linked = 0
+		for count in link_clusters(clusters, options['batch_size']):
+			linked += count
+			self.stdout.write(f'Linked {linked} of {len(clusters)} customers')
+		removed = delete_orphan_customers(options['batch_size'])
+		self.stdout.write(self.style.SUCCESS(
+			f'Linked {lead_count} leads to {len(clusters)} customers and removed {removed} customers without leads'
+		))
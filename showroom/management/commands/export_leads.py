@@ -0,0 +1,52 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from showroom.analytics import LEAD_TYPES
+from showroom.archival import lead_details
+from showroom.models import ArchivedLead
+
+COLUMNS = ['lead_type', 'id', 'archived', 'created_at', 'name', 'phone', 'email', 'bike_slug', 'source', 'customer_id', 'details']
+
+
+class Command(BaseCommand):
+	help = 'Export leads as CSV, optionally including archived leads'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--type', choices=sorted(LEAD_TYPES.values()), help='Only export one lead type')
+		parser.add_argument('--include-archived', action='store_true', help='Also export leads from the archive')
+		parser.add_argument('--year', type=int, help='Only export archived leads from this year')
+		parser.add_argument('--output', help='CSV file to write (default stdout)')
+
+	def handle(self, *args, **options):
+		output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else self.stdout
+		try:
+			writer = csv.writer(output)
+			writer.writerow(COLUMNS)
+			for model, lead_type in LEAD_TYPES.items():
+				if options['type'] and options['type'] != lead_type:
+					continue
+				for lead in model.objects.order_by('created_at').iterator(chunk_size=2000):
+					writer.writerow([
+						lead_type, lead.pk, False, lead.created_at.isoformat(), lead.name, lead.phone,
+						getattr(lead, 'email', ''), lead.bike_slug, lead.source, lead.customer_id or '',
+						json.dumps(lead_details(lead), cls=DjangoJSONEncoder),
+					])
+
+			if options['include_archived']:
+				archived = ArchivedLead.objects.order_by('created_at')
+				if options['type']:
+					archived = archived.filter(lead_type=options['type'])
+				if options['year']:
+					archived = archived.filter(year=options['year'])
+				for lead in archived.iterator(chunk_size=2000):
+					writer.writerow([
+						lead.lead_type, lead.original_id, True, lead.created_at.isoformat(), lead.name, lead.phone,
+						lead.email, lead.bike_slug, lead.source, lead.customer_id or '',
+						json.dumps(lead.details, cls=DjangoJSONEncoder),
+					])
+		finally:
+			if options['output']:
+				output.close()
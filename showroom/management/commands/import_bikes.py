@@ -6,8 +6,11 @@ from showroom.models import Bike
 class Command(BaseCommand):
 	help = 'Import bikes from bikes.json file into the database'
 
+	def add_arguments(self, parser):
+		parser.add_argument('--file', default='static/assets/data/bikes.json', help='Path to the bikes JSON file')
+
 	def handle(self, *args, **options):
-		json_file = 'static/assets/data/bikes.json'
+		json_file = options['file']
 		
 		try:
 			with open(json_file, 'r', encoding='utf-8') as f:
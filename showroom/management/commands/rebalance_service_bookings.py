@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from showroom.models import ServiceBooking
+from showroom.service_planner import plan_rebalance
+
+
+class Command(BaseCommand):
+	help = 'Move service bookings off overbooked days onto the nearest later day with free bay capacity'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--start', help='First day to rebalance (YYYY-MM-DD, default today)')
+		parser.add_argument('--days', type=int, default=30, help='Number of days to rebalance')
+		parser.add_argument('--dry-run', action='store_true', help='Show the moves without saving them')
+
+	def handle(self, *args, **options):
+		if options['start']:
+			try:
+				start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+			except ValueError:
+				raise CommandError('--start must be a date in YYYY-MM-DD format')
+		else:
+			start = timezone.localdate()
+		end = start + timedelta(days=options['days'] - 1)
+
+		moves = plan_rebalance(start, end)
+		for booking, new_date in moves:
+			self.stdout.write(f'{booking.name} ({booking.phone}): {booking.preferred_date} -> {new_date}')
+
+		if not moves:
+			self.stdout.write(self.style.SUCCESS('No overbooked days'))
+			return
+		if options['dry_run']:
+			self.stdout.write(self.style.WARNING(f'Dry run: {len(moves)} bookings would be moved'))
+			return
+
+		for booking, new_date in moves:
+			booking.rescheduled_from = booking.rescheduled_from or booking.preferred_date
+			booking.preferred_date = new_date
+		with transaction.atomic():
+			ServiceBooking.objects.bulk_update(
+				[booking for booking, _ in moves], ['preferred_date', 'rescheduled_from'], batch_size=500
+			)
+		self.stdout.write(self.style.SUCCESS(f'Moved {len(moves)} bookings'))
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from showroom.routers import PRIMARY_DB
+
+
+class Command(BaseCommand):
+	help = 'Snapshot the primary database into the read-only catalog replica'
+
+	def handle(self, *args, **options):
+		source_path = str(connections.databases[PRIMARY_DB]['NAME'])
+		replica_path = str(settings.CATALOG_REPLICA_PATH)
+		replica_dir = os.path.dirname(replica_path) or '.'
+
+		# Copy into a temp file next to the replica and rename it into place, so
+		# readers see either the old snapshot or the new one, never a partial file.
+		fd, tmp_path = tempfile.mkstemp(prefix='.replica-', suffix='.sqlite3', dir=replica_dir)
+		os.close(fd)
+		try:
+			source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+			target = sqlite3.connect(tmp_path)
+			try:
+				source.backup(target)
+			finally:
+				target.close()
+				source.close()
+			os.replace(tmp_path, replica_path)
+		except (OSError, sqlite3.Error) as e:
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+			raise CommandError(f'Could not refresh catalog replica: {e}')
+
+		self.stdout.write(self.style.SUCCESS(f'Catalog replica refreshed: {replica_path}'))
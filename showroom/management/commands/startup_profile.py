@@ -0,0 +1,72 @@
+import json
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Settings profiles compared by default: everything, and public-only workers.
+PROFILES = ('backend.settings', 'backend.settings_public')
+
+# Boots a worker the way backend/wsgi.py does, then loads the URL conf that
+# the first request would otherwise import.
+PROBE = '''
+import json, os, sys, time
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[1]
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+resolved = time.perf_counter()
+print(json.dumps({'setup_ms': (booted - started) * 1000, 'urls_ms': (resolved - booted) * 1000}))
+'''
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (.*)$')
+
+
+def package_of(module):
+	"""Group django.contrib.admin.* under django.contrib.admin and e.g. asgiref.sync under asgiref"""
+	parts = module.split('.')
+	depth = 3 if parts[:2] == ['django', 'contrib'] else 2 if parts[0] in ('django', 'showroom') else 1
+	return '.'.join(parts[:depth])
+
+
+def parse_importtime(output):
+	"""Return {package: self time in ms} from `python -X importtime` output"""
+	packages = {}
+	for line in output.splitlines():
+		match = _IMPORT_LINE.match(line)
+		if match:
+			package = package_of(match.group(3).strip())
+			packages[package] = packages.get(package, 0) + int(match.group(1)) / 1000
+	return packages
+
+
+class Command(BaseCommand):
+	help = 'Report worker boot time and the packages it spends import time on, per settings profile'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--profile', action='append', dest='profiles', help=f'Settings module to profile (repeatable, default: {", ".join(PROFILES)})')
+		parser.add_argument('--top', type=int, default=15, help='Packages to list per profile (default: 15)')
+
+	def handle(self, *args, **options):
+		for profile in options['profiles'] or PROFILES:
+			completed = subprocess.run(
+				[sys.executable, '-X', 'importtime', '-c', PROBE, profile],
+				cwd=settings.BASE_DIR, capture_output=True, text=True,
+			)
+			if completed.returncode:
+				raise CommandError(f'{profile} failed to boot:\n{completed.stderr[-2000:]}')
+			timings = json.loads(completed.stdout.strip().splitlines()[-1])
+			packages = parse_importtime(completed.stderr)
+
+			self.stdout.write(self.style.MIGRATE_HEADING(f'\n{profile}'))
+			self.stdout.write(
+				f'boot {timings["setup_ms"]:.1f} ms, URL conf {timings["urls_ms"]:.1f} ms, '
+				f'{sum(packages.values()):.1f} ms importing {len(packages)} packages'
+			)
+			for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+				self.stdout.write(f'  {package:<36}{ms:>8.1f} ms')
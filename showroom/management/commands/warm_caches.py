@@ -0,0 +1,86 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from showroom.models import Bike
+from showroom.warmup import warm_caches
+
+# Public URLs whose first request is timed by --measure, in request order.
+PROBE_URLS = ('home', 'bikes_json', 'models', 'offers', 'model_detail')
+
+
+def _probe_host():
+	hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+	return hosts[0] if hosts else 'localhost'
+
+
+class Command(BaseCommand):
+	help = 'Build the catalog snapshot, compile the showroom templates and resolve URLs ahead of the first request'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--measure', action='store_true', help='Compare first-request latency of fresh processes with and without warm-up')
+		parser.add_argument('--runs', type=int, default=3, help='Fresh processes per mode for --measure (default: 3)')
+		parser.add_argument('--probe', choices=['cold', 'warm'], help=argparse.SUPPRESS)
+
+	def handle(self, *args, **options):
+		if options['probe']:
+			self.stdout.write(json.dumps(self._probe(warm=options['probe'] == 'warm')))
+		elif options['measure']:
+			self._measure(options['runs'])
+		else:
+			timings = warm_caches()
+			for name, ms in timings.items():
+				self.stdout.write(f'{name:<14}{ms:>9.1f} ms')
+			self.stdout.write(self.style.SUCCESS(f'Warmed caches in {sum(timings.values()):.1f} ms'))
+
+	def _probe(self, warm):
+		"""Time the first request to each PROBE_URLS in this (fresh) process"""
+		warmup_ms = sum(warm_caches().values()) if warm else 0
+		client = Client(HTTP_HOST=_probe_host())
+		latencies = {}
+		for name in PROBE_URLS:
+			if name == 'model_detail':
+				slug = Bike.objects.filter(is_active=True).values_list('slug', flat=True).first()
+				if not slug:
+					continue
+				url = reverse(name, kwargs={'slug': slug})
+			else:
+				url = reverse(name)
+			started = time.perf_counter()
+			response = client.get(url)
+			latencies[name] = (time.perf_counter() - started) * 1000
+			if response.status_code != 200:
+				raise CommandError(f'{url} returned {response.status_code}')
+		return {'warmup_ms': warmup_ms, 'latencies': latencies}
+
+	def _measure(self, runs):
+		results = {'cold': [], 'warm': []}
+		for _ in range(runs):
+			for mode in results:
+				command = [
+					sys.executable, '-m', 'django', 'warm_caches', '--probe', mode,
+					'--settings', settings.SETTINGS_MODULE,
+				]
+				completed = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+				if completed.returncode:
+					raise CommandError(f'{mode} probe failed:\n{completed.stderr}')
+				results[mode].append(json.loads(completed.stdout))
+
+		def median(mode, name):
+			values = [run['latencies'][name] for run in results[mode] if name in run['latencies']]
+			return statistics.median(values) if values else 0
+
+		self.stdout.write(f'First request after process start, median of {runs} runs')
+		self.stdout.write(f'{"url":<16}{"cold":>10}{"warm":>10}')
+		for name in PROBE_URLS:
+			self.stdout.write(f'{name:<16}{median("cold", name):>8.1f}ms{median("warm", name):>8.1f}ms')
+		warmup = statistics.median(run['warmup_ms'] for run in results['warm'])
+		self.stdout.write(f'Warm-up itself took {warmup:.1f} ms before the worker took traffic')
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0003_alter_bike_cc_category_alter_bike_colors_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bike',
+            name='demo_units',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Demo bikes available for test rides in each slot'),
+        ),
+        migrations.CreateModel(
+            name='TestRideSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('capacity', models.PositiveSmallIntegerField(help_text='Demo units available in this slot')),
+                ('booked', models.PositiveSmallIntegerField(default=0)),
+                ('bike', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_ride_slots', to='showroom.bike')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='testriderequest',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='showroom.testrideslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='testrideslot',
+            constraint=models.UniqueConstraint(fields=('bike', 'date', 'start_time'), name='unique_test_ride_slot'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:48
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0004_test_ride_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceDayCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('bays', models.PositiveSmallIntegerField()),
+                ('technician_hours', models.DecimalField(decimal_places=1, max_digits=5, validators=[django.core.validators.MinValueValidator(0)])),
+                ('note', models.CharField(blank=True, help_text='e.g., Holiday, technician training', max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Service day capacity',
+                'verbose_name_plural': 'Service day capacities',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='servicebooking',
+            name='rescheduled_from',
+            field=models.DateField(blank=True, help_text='Original date if the booking was moved to balance bay load', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='servicebooking',
+            index=models.Index(fields=['preferred_date'], name='service_preferred_date_idx'),
+        ),
+    ]
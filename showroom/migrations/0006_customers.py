@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0005_service_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('phone', models.CharField(blank=True, help_text='Normalized 10-digit mobile number', max_length=20)),
+                ('email', models.EmailField(blank=True, help_text='Normalized email address', max_length=254)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='contactinquiry',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inquiries', to='showroom.customer'),
+        ),
+        migrations.AddField(
+            model_name='servicebooking',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='service_bookings', to='showroom.customer'),
+        ),
+        migrations.AddField(
+            model_name='testriderequest',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='test_rides', to='showroom.customer'),
+        ),
+        migrations.CreateModel(
+            name='CustomerContactKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contact_keys', to='showroom.customer')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0006_customers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactinquiry',
+            name='source',
+            field=models.CharField(blank=True, help_text='Page the form was submitted from', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='servicebooking',
+            name='source',
+            field=models.CharField(blank=True, help_text='Page the form was submitted from', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='testriderequest',
+            name='source',
+            field=models.CharField(blank=True, help_text='Page the form was submitted from', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='LeadDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('lead_type', models.CharField(choices=[('test_ride', 'Test ride'), ('inquiry', 'Inquiry'), ('service', 'Service')], max_length=20)),
+                ('bike_slug', models.CharField(blank=True, max_length=80)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'lead_type', 'bike_slug', 'source'), name='unique_lead_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:52
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0007_lead_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lead_type', models.CharField(choices=[('test_ride', 'Test ride'), ('inquiry', 'Inquiry'), ('service', 'Service')], max_length=20)),
+                ('original_id', models.BigIntegerField()),
+                ('year', models.PositiveSmallIntegerField(help_text='Year the lead was created; archives are partitioned by it')),
+                ('name', models.CharField(max_length=120)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('phone', models.CharField(max_length=20)),
+                ('bike_slug', models.CharField(blank=True, max_length=80)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('details', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Remaining fields of the original lead')),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_leads', to='showroom.customer')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['year', 'lead_type'], name='archived_lead_year_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lead_type', 'original_id'), name='unique_archived_lead')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:57
+
+from django.db import migrations, models
+
+
+def seed_change_log(apps, schema_editor):
+    # Start the feed with the current catalog so a sync from version 0 is complete.
+    Bike = apps.get_model('showroom', 'Bike')
+    Offer = apps.get_model('showroom', 'Offer')
+    CatalogChange = apps.get_model('showroom', 'CatalogChange')
+    changes = [
+        CatalogChange(kind='bike', object_id=pk, key=slug, action='upsert')
+        for pk, slug in Bike.objects.order_by('pk').values_list('pk', 'slug')
+    ]
+    changes += [
+        CatalogChange(kind='offer', object_id=pk, key=str(pk), action='upsert')
+        for pk in Offer.objects.order_by('pk').values_list('pk', flat=True)
+    ]
+    CatalogChange.objects.bulk_create(changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0008_archived_leads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('version', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('bike', 'Bike'), ('offer', 'Offer')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('key', models.CharField(help_text='Bike slug or offer id that clients know the object by', max_length=100)),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['version'],
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='catalog_change_object_idx')],
+            },
+        ),
+        migrations.RunPython(seed_change_log, migrations.RunPython.noop),
+    ]
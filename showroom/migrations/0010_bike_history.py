@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:59
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_existing_bikes(apps, schema_editor):
+    # Give every bike a first snapshot so later edits are stored as diffs.
+    Bike = apps.get_model('showroom', 'Bike')
+    BikeVersion = apps.get_model('showroom', 'BikeVersion')
+    fields = [field for field in Bike._meta.concrete_fields if field.name not in {'id', 'created_at', 'updated_at'}]
+    BikeVersion.objects.bulk_create([
+        BikeVersion(
+            bike_pk=bike.pk,
+            slug=bike.slug,
+            is_snapshot=True,
+            values={field.name: field.value_from_object(bike) for field in fields},
+        )
+        for bike in Bike.objects.order_by('pk')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0009_catalog_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BikeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bike_pk', models.BigIntegerField(help_text='Id of the bike; kept after the bike is deleted')),
+                ('slug', models.SlugField(max_length=100)),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('values', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='All fields for a snapshot, changed fields otherwise')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['bike_pk', 'recorded_at'], name='bike_version_bike_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_bikes, migrations.RunPython.noop),
+    ]
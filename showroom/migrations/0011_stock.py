@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0010_bike_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('slug', models.SlugField(max_length=60, unique=True)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Branches',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('colour', models.CharField(max_length=100)),
+                ('change', models.IntegerField(help_text='Units added (positive) or removed (negative)')),
+                ('units_after', models.PositiveIntegerField(help_text='Units at the branch in this colour after the movement')),
+                ('reason', models.CharField(choices=[('receipt', 'Received from Bajaj'), ('sale', 'Sold'), ('transfer_in', 'Transfer in'), ('transfer_out', 'Transfer out'), ('adjustment', 'Stock count adjustment')], max_length=20)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bike', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='showroom.bike')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='showroom.branch')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('colour', models.CharField(max_length=100)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bike', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='showroom.bike')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='showroom.branch')),
+            ],
+            options={
+                'ordering': ['bike', 'branch', 'colour'],
+                'constraints': [models.UniqueConstraint(fields=('bike', 'branch', 'colour'), name='unique_stock_level')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0011_stock'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='catalogchange',
+            name='catalog_change_object_idx',
+        ),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['kind', 'key'], name='catalog_change_key_idx'),
+        ),
+    ]
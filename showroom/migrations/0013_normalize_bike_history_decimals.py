@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:40
+
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def normalize_decimals(apps, schema_editor):
+    # Entries recorded so far stored decimals as given, e.g. '131000' next to
+    # '132000.00'; rewrite them with the field's decimal places.
+    Bike = apps.get_model('showroom', 'Bike')
+    BikeVersion = apps.get_model('showroom', 'BikeVersion')
+    places = {
+        field.name: field.decimal_places
+        for field in Bike._meta.concrete_fields
+        if field.get_internal_type() == 'DecimalField'
+    }
+    changed = []
+    for version in BikeVersion.objects.only('values').iterator():
+        values = {
+            name: format(Decimal(str(value)), f'.{places[name]}f') if name in places and value is not None else value
+            for name, value in version.values.items()
+        }
+        if values != version.values:
+            version.values = values
+            changed.append(version)
+    BikeVersion.objects.bulk_update(changed, ['values'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0012_catalog_change_key_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_decimals, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 
 class Bike(models.Model):
@@ -44,6 +46,9 @@ class Bike(models.Model):
 	# Gallery images (optional)
 	gallery_images = models.TextField(blank=True, default='', help_text="Enter image paths separated by commas")
 	
+	# Test rides (optional)
+	demo_units = models.PositiveSmallIntegerField(default=1, help_text="Demo bikes available for test rides in each slot")
+	
 	is_active = models.BooleanField(default=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
@@ -105,6 +110,51 @@ class Offer(models.Model):
 		return f"{self.title}{bike_name}"
 
 
+class Customer(models.Model):
+	"""One person behind any number of test ride, inquiry and service leads"""
+	name = models.CharField(max_length=120)
+	phone = models.CharField(max_length=20, blank=True, help_text="Normalized 10-digit mobile number")
+	email = models.EmailField(blank=True, help_text="Normalized email address")
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['-created_at']
+
+	def __str__(self):
+		return f"{self.name} ({self.phone or self.email})"
+
+
+class CustomerContactKey(models.Model):
+	"""Hashed normalized phone or email pointing at the customer it belongs to"""
+	key = models.CharField(max_length=40, unique=True)
+	customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='contact_keys')
+
+	def __str__(self):
+		return self.key
+
+
+class TestRideSlot(models.Model):
+	"""Bookings held against one bike's demo units in one time slot"""
+	bike = models.ForeignKey(Bike, on_delete=models.CASCADE, related_name='test_ride_slots')
+	date = models.DateField()
+	start_time = models.TimeField()
+	capacity = models.PositiveSmallIntegerField(help_text="Demo units available in this slot")
+	booked = models.PositiveSmallIntegerField(default=0)
+
+	class Meta:
+		ordering = ['date', 'start_time']
+		constraints = [
+			models.UniqueConstraint(fields=['bike', 'date', 'start_time'], name='unique_test_ride_slot'),
+		]
+
+	def __str__(self):
+		return f"{self.bike.name} - {self.date} {self.start_time:%H:%M} ({self.booked}/{self.capacity})"
+
+	@property
+	def remaining(self):
+		return max(self.capacity - self.booked, 0)
+
+
 class TestRideRequest(models.Model):
 	name = models.CharField(max_length=120)
 	email = models.EmailField()
@@ -112,6 +162,9 @@ class TestRideRequest(models.Model):
 	bike_slug = models.CharField(max_length=80)
 	preferred_date = models.DateField()
 	preferred_time = models.TimeField()
+	slot = models.ForeignKey(TestRideSlot, on_delete=models.SET_NULL, null=True, blank=True, related_name='requests')
+	customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='test_rides')
+	source = models.CharField(max_length=50, blank=True, help_text="Page the form was submitted from")
 	notes = models.TextField(blank=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 
@@ -127,6 +180,8 @@ class ContactInquiry(models.Model):
 	email = models.EmailField()
 	phone = models.CharField(max_length=20)
 	bike_slug = models.CharField(max_length=80, blank=True)
+	customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='inquiries')
+	source = models.CharField(max_length=50, blank=True, help_text="Page the form was submitted from")
 	message = models.TextField(blank=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 
@@ -142,11 +197,195 @@ class ServiceBooking(models.Model):
 	phone = models.CharField(max_length=20)
 	bike_slug = models.CharField(max_length=80)
 	preferred_date = models.DateField()
+	rescheduled_from = models.DateField(null=True, blank=True, help_text="Original date if the booking was moved to balance bay load")
+	customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='service_bookings')
+	source = models.CharField(max_length=50, blank=True, help_text="Page the form was submitted from")
 	notes = models.TextField(blank=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 
 	class Meta:
 		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['preferred_date'], name='service_preferred_date_idx'),
+		]
 
 	def __str__(self):
 		return f"Service: {self.name} - {self.bike_slug}"
+
+
+class ServiceDayCapacity(models.Model):
+	"""Override of the default service bay and technician capacity for one day"""
+	date = models.DateField(unique=True)
+	bays = models.PositiveSmallIntegerField()
+	technician_hours = models.DecimalField(max_digits=5, decimal_places=1, validators=[MinValueValidator(0)])
+	note = models.CharField(max_length=200, blank=True, help_text="e.g., Holiday, technician training")
+
+	class Meta:
+		ordering = ['date']
+		verbose_name = 'Service day capacity'
+		verbose_name_plural = 'Service day capacities'
+
+	def __str__(self):
+		return f"{self.date}: {self.bays} bays, {self.technician_hours} technician hours"
+
+
+class LeadDailyRollup(models.Model):
+	"""Number of leads of one type for one bike and source on one day"""
+	LEAD_TYPES = [
+		('test_ride', 'Test ride'),
+		('inquiry', 'Inquiry'),
+		('service', 'Service'),
+	]
+
+	date = models.DateField()
+	lead_type = models.CharField(max_length=20, choices=LEAD_TYPES)
+	bike_slug = models.CharField(max_length=80, blank=True)
+	source = models.CharField(max_length=50, blank=True)
+	count = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		ordering = ['-date']
+		constraints = [
+			models.UniqueConstraint(fields=['date', 'lead_type', 'bike_slug', 'source'], name='unique_lead_rollup'),
+		]
+
+	def __str__(self):
+		return f"{self.date} {self.lead_type} {self.bike_slug or '-'}: {self.count}"
+
+
+class ArchivedLead(models.Model):
+	"""A test ride, inquiry or service lead moved out of its hot table by age"""
+	lead_type = models.CharField(max_length=20, choices=LeadDailyRollup.LEAD_TYPES)
+	original_id = models.BigIntegerField()
+	year = models.PositiveSmallIntegerField(help_text="Year the lead was created; archives are partitioned by it")
+	name = models.CharField(max_length=120)
+	email = models.EmailField(blank=True)
+	phone = models.CharField(max_length=20)
+	bike_slug = models.CharField(max_length=80, blank=True)
+	source = models.CharField(max_length=50, blank=True)
+	customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_leads')
+	details = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="Remaining fields of the original lead")
+	created_at = models.DateTimeField()
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['year', 'lead_type'], name='archived_lead_year_idx'),
+		]
+		constraints = [
+			models.UniqueConstraint(fields=['lead_type', 'original_id'], name='unique_archived_lead'),
+		]
+
+	def __str__(self):
+		return f"Archived {self.get_lead_type_display()}: {self.name}"
+
+
+class CatalogChange(models.Model):
+	"""One bike or offer upsert or delete; versions only ever increase"""
+	KINDS = [
+		('bike', 'Bike'),
+		('offer', 'Offer'),
+	]
+	ACTIONS = [
+		('upsert', 'Upsert'),
+		('delete', 'Delete'),
+	]
+
+	version = models.BigAutoField(primary_key=True)
+	kind = models.CharField(max_length=10, choices=KINDS)
+	object_id = models.BigIntegerField()
+	key = models.CharField(max_length=100, help_text="Bike slug or offer id that clients know the object by")
+	action = models.CharField(max_length=10, choices=ACTIONS)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['version']
+		indexes = [
+			models.Index(fields=['kind', 'key'], name='catalog_change_key_idx'),
+		]
+
+	def __str__(self):
+		return f"v{self.version} {self.action} {self.kind} {self.key}"
+
+
+class BikeVersion(models.Model):
+	"""
+	One entry in a bike's append-only history: either a full snapshot of its
+	fields or only the fields that changed since the previous entry
+	"""
+	bike_pk = models.BigIntegerField(help_text="Id of the bike; kept after the bike is deleted")
+	slug = models.SlugField(max_length=100)
+	is_snapshot = models.BooleanField(default=False)
+	is_deleted = models.BooleanField(default=False)
+	values = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="All fields for a snapshot, changed fields otherwise")
+	recorded_at = models.DateTimeField(default=timezone.now)
+
+	class Meta:
+		ordering = ['-id']
+		indexes = [
+			models.Index(fields=['bike_pk', 'recorded_at'], name='bike_version_bike_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.slug} @ {self.recorded_at:%Y-%m-%d %H:%M}"
+
+
+class Branch(models.Model):
+	"""A showroom or outlet that holds its own stock"""
+	name = models.CharField(max_length=120)
+	slug = models.SlugField(max_length=60, unique=True)
+	address = models.CharField(max_length=255, blank=True)
+	phone = models.CharField(max_length=20, blank=True)
+	is_active = models.BooleanField(default=True)
+
+	class Meta:
+		ordering = ['name']
+		verbose_name_plural = 'Branches'
+
+	def __str__(self):
+		return self.name
+
+
+class StockLevel(models.Model):
+	"""Units of one bike in one colour held at one branch; changed only through StockMovement"""
+	bike = models.ForeignKey(Bike, on_delete=models.CASCADE, related_name='stock_levels')
+	branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='stock_levels')
+	colour = models.CharField(max_length=100)
+	units = models.PositiveIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ['bike', 'branch', 'colour']
+		constraints = [
+			models.UniqueConstraint(fields=['bike', 'branch', 'colour'], name='unique_stock_level'),
+		]
+
+	def __str__(self):
+		return f"{self.bike.name} {self.colour} @ {self.branch.name}: {self.units}"
+
+
+class StockMovement(models.Model):
+	"""Units received, sold, transferred or adjusted for one bike colour at one branch"""
+	REASONS = [
+		('receipt', 'Received from Bajaj'),
+		('sale', 'Sold'),
+		('transfer_in', 'Transfer in'),
+		('transfer_out', 'Transfer out'),
+		('adjustment', 'Stock count adjustment'),
+	]
+
+	bike = models.ForeignKey(Bike, on_delete=models.CASCADE, related_name='stock_movements')
+	branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='stock_movements')
+	colour = models.CharField(max_length=100)
+	change = models.IntegerField(help_text="Units added (positive) or removed (negative)")
+	units_after = models.PositiveIntegerField(help_text="Units at the branch in this colour after the movement")
+	reason = models.CharField(max_length=20, choices=REASONS)
+	note = models.CharField(max_length=200, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['-created_at']
+
+	def __str__(self):
+		return f"{self.get_reason_display()}: {self.change:+d} {self.bike.name} {self.colour} @ {self.branch.name}"
@@ -0,0 +1,109 @@
+"""Bulk price revisions from a CSV price sheet"""
+import csv
+import io
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import catalog_snapshot
+from .changefeed import record_changes
+from .history import record_versions
+from .models import Bike
+from .routers import PRIMARY_DB
+
+# Columns a price sheet may revise, besides the required slug column.
+PRICE_FIELDS = ('ex_showroom_price', 'on_road_price', 'emi')
+
+
+def _clean_price(field, raw):
+	if field.get_internal_type() == 'DecimalField':
+		# Sheets often carry prices as "₹1,29,999".
+		raw = raw.replace('₹', '').replace(',', '').strip()
+		return field.clean(raw, None).quantize(Decimal(1).scaleb(-field.decimal_places))
+	return field.clean(raw, None)
+
+
+def parse_price_sheet(text):
+	"""
+	Parse a CSV price sheet into ({slug: {field: value}}, [error messages]).
+
+	The sheet needs a slug column and at least one of PRICE_FIELDS; a blank
+	cell leaves that price as it is.
+	"""
+	reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+	columns = [column.strip().lower() for column in reader.fieldnames or []]
+	if 'slug' not in columns or not set(columns) & set(PRICE_FIELDS):
+		return {}, [f'The sheet needs a slug column and at least one of {", ".join(PRICE_FIELDS)}.']
+	reader.fieldnames = columns
+
+	revisions, errors = {}, []
+	for row in reader:
+		line = reader.line_num
+		slug = (row.get('slug') or '').strip()
+		if not slug:
+			errors.append(f'Line {line}: missing slug.')
+			continue
+		if slug in revisions:
+			errors.append(f'Line {line}: {slug} is listed more than once.')
+			continue
+		values = {}
+		for name in PRICE_FIELDS:
+			raw = (row.get(name) or '').strip()
+			if not raw:
+				continue
+			try:
+				values[name] = _clean_price(Bike._meta.get_field(name), raw)
+			except ValidationError as error:
+				errors.append(f'Line {line}: {name} {raw!r}: {" ".join(error.messages)}')
+		revisions[slug] = values
+	return revisions, errors
+
+
+def price_diff(revisions):
+	"""
+	Compare revisions with the current bikes on the primary, in one query.
+
+	Returns ([(bike, {field: (current, revised)})] for the bikes whose prices
+	change, [slugs not in the catalog]).
+	"""
+	bikes = {bike.slug: bike for bike in Bike.objects.using(PRIMARY_DB).filter(slug__in=list(revisions))}
+	changes = []
+	for slug, values in revisions.items():
+		if slug not in bikes:
+			continue
+		bike = bikes[slug]
+		changed = {
+			name: (getattr(bike, name), value)
+			for name, value in values.items()
+			if getattr(bike, name) != value
+		}
+		if changed:
+			changes.append((bike, changed))
+	return changes, [slug for slug in revisions if slug not in bikes]
+
+
+def apply_price_revision(changes):
+	"""
+	Write the changes from price_diff() with one bulk_update and return the number of bikes revised.
+
+	bulk_update skips the save signals, so the change feed and price history
+	are recorded here in the same transaction, and the catalog snapshot is
+	dropped once for the whole sheet rather than once per bike.
+	"""
+	if not changes:
+		return 0
+	now = timezone.now()
+	bikes = []
+	for bike, changed in changes:
+		for name, (_, value) in changed.items():
+			setattr(bike, name, value)
+		bike.updated_at = now
+		bikes.append(bike)
+	with transaction.atomic(using=PRIMARY_DB):
+		Bike.objects.using(PRIMARY_DB).bulk_update(bikes, [*PRICE_FIELDS, 'updated_at'])
+		record_changes(bikes)
+		record_versions(bikes)
+		transaction.on_commit(catalog_snapshot.invalidate, using=PRIMARY_DB)
+	return len(bikes)
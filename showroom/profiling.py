@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+METRICS = ('wall_ms', 'db_ms', 'db_queries', 'template_ms', 'bytes')
+
+# The sample being recorded for the current request, if it was picked.
+_current = ContextVar('showroom_perf_sample', default=None)
+
+
+class _Sample:
+	__slots__ = ('started', 'db_ms', 'db_queries', 'template_ms')
+
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.db_ms = 0.0
+		self.db_queries = 0
+		self.template_ms = 0.0
+
+
+class PerfStore:
+	"""Rolling window of recent samples per view, shared by all threads in the worker"""
+
+	def __init__(self, window=500):
+		self.window = window
+		self._lock = threading.Lock()
+		self._views = defaultdict(lambda: {metric: deque(maxlen=self.window) for metric in METRICS})
+
+	def add(self, view_name, values):
+		with self._lock:
+			series = self._views[view_name]
+			for metric in METRICS:
+				series[metric].append(values[metric])
+
+	def clear(self):
+		with self._lock:
+			self._views.clear()
+
+	def snapshot(self):
+		"""Return p50/p95/max per metric for every view seen in the window"""
+		with self._lock:
+			views = {name: {metric: sorted(values) for metric, values in series.items()}
+			         for name, series in self._views.items()}
+		report = {}
+		for name, series in sorted(views.items()):
+			report[name] = {'samples': len(series['wall_ms'])}
+			for metric, values in series.items():
+				report[name][metric] = {
+					'p50': _percentile(values, 50),
+					'p95': _percentile(values, 95),
+					'max': values[-1] if values else 0,
+				}
+		return report
+
+
+def _percentile(sorted_values, pct):
+	if not sorted_values:
+		return 0
+	index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+	return sorted_values[index]
+
+
+perf_store = PerfStore(window=getattr(settings, 'PERF_WINDOW', 500))
+
+
+def _record_query(execute, sql, params, many, context):
+	sample = _current.get()
+	if sample is None:
+		return execute(sql, params, many, context)
+	started = time.perf_counter()
+	try:
+		return execute(sql, params, many, context)
+	finally:
+		sample.db_ms += (time.perf_counter() - started) * 1000
+		sample.db_queries += 1
+
+
+def _install_query_wrapper(connection, **kwargs):
+	if _record_query not in connection.execute_wrappers:
+		connection.execute_wrappers.append(_record_query)
+
+
+_template_render = Template.render
+
+
+def _timed_template_render(self, *args, **kwargs):
+	sample = _current.get()
+	if sample is None:
+		return _template_render(self, *args, **kwargs)
+	started = time.perf_counter()
+	try:
+		return _template_render(self, *args, **kwargs)
+	finally:
+		sample.template_ms += (time.perf_counter() - started) * 1000
+
+
+def install_hooks():
+	"""
+	Time queries on every connection and template renders, once per process.
+
+	Called from the app's ready() when PERF_PROFILING_ENABLED is set. Both
+	hooks only record while PerfMiddleware has picked the current request.
+	"""
+	connection_created.connect(_install_query_wrapper, dispatch_uid='showroom_perf_queries')
+	for connection in connections.all(initialized_only=True):
+		_install_query_wrapper(connection)
+	Template.render = _timed_template_render
+
+
+def uninstall_hooks():
+	connection_created.disconnect(dispatch_uid='showroom_perf_queries')
+	for connection in connections.all(initialized_only=True):
+		if _record_query in connection.execute_wrappers:
+			connection.execute_wrappers.remove(_record_query)
+	Template.render = _template_render
+
+
+class PerfMiddleware:
+	"""
+	Opt-in per-view profiling: wall time, DB query count/time, template render
+	time and response size for a sampled fraction of requests. Results go to
+	perf_store (served at /__perf__) and to a Server-Timing response header.
+	Enable with PERF_PROFILING_ENABLED and tune PERF_SAMPLE_RATE.
+	"""
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		if not getattr(settings, 'PERF_PROFILING_ENABLED', False):
+			raise MiddlewareNotUsed
+		self.get_response = get_response
+		self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 1.0)
+		self.async_mode = iscoroutinefunction(get_response)
+		if self.async_mode:
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if self.async_mode:
+			return self.__acall__(request)
+		if random.random() >= self.sample_rate:
+			return self.get_response(request)
+		token = _current.set(_Sample())
+		try:
+			response = self.get_response(request)
+			self._finish(request, response)
+		finally:
+			_current.reset(token)
+		return response
+
+	async def __acall__(self, request):
+		if random.random() >= self.sample_rate:
+			return await self.get_response(request)
+		token = _current.set(_Sample())
+		try:
+			response = await self.get_response(request)
+			self._finish(request, response)
+		finally:
+			_current.reset(token)
+		return response
+
+	def _finish(self, request, response):
+		sample = _current.get()
+		wall_ms = (time.perf_counter() - sample.started) * 1000
+		size = 0 if response.streaming else len(response.content)
+		view_name = getattr(request.resolver_match, 'view_name', None) or 'unresolved'
+		perf_store.add(view_name, {
+			'wall_ms': round(wall_ms, 3),
+			'db_ms': round(sample.db_ms, 3),
+			'db_queries': sample.db_queries,
+			'template_ms': round(sample.template_ms, 3),
+			'bytes': size,
+		})
+		response['Server-Timing'] = (
+			f'total;dur={wall_ms:.2f}, '
+			f'db;dur={sample.db_ms:.2f};desc="{sample.db_queries} queries", '
+			f'tpl;dur={sample.template_ms:.2f}'
+		)
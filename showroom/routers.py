@@ -0,0 +1,37 @@
+from django.db import connections
+
+PRIMARY_DB = 'default'
+REPLICA_DB = 'replica'
+
+# Catalog models are read-mostly and safe to serve from a snapshot; everything
+# else (leads, auth, sessions, admin log) always stays on the primary. The
+# change feed is read alongside the catalog so deltas match the same snapshot.
+CATALOG_MODELS = {'bike', 'offer', 'catalogchange'}
+
+
+def _is_catalog(model):
+	return model._meta.app_label == 'showroom' and model._meta.model_name in CATALOG_MODELS
+
+
+def replica_available():
+	"""Return True when a catalog replica alias is configured"""
+	return REPLICA_DB in connections.databases
+
+
+class CatalogReplicaRouter:
+	"""Send Bike/Offer reads to the read-only replica and all writes to the primary"""
+
+	def db_for_read(self, model, **hints):
+		if _is_catalog(model) and replica_available():
+			return REPLICA_DB
+		return PRIMARY_DB
+
+	def db_for_write(self, model, **hints):
+		return PRIMARY_DB
+
+	def allow_relation(self, obj1, obj2, **hints):
+		# The replica is a copy of the primary, so rows from either side relate.
+		return True
+
+	def allow_migrate(self, db, app_label, model_name=None, **hints):
+		return db == PRIMARY_DB
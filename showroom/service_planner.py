@@ -0,0 +1,142 @@
+"""Service bay capacity planning over ServiceBooking daily load"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .dedupe import create_lead
+from .models import ServiceBooking, ServiceDayCapacity
+
+
+def bookings_per_day(bays, technician_hours):
+	"""Return how many service bookings fit in a day with the given bays and technician hours"""
+	if not bays or not technician_hours:
+		return 0
+	hours = settings.SERVICE_HOURS_PER_BOOKING
+	bay_limit = bays * settings.SERVICE_WORKDAY_HOURS // hours
+	technician_limit = int(technician_hours // hours)
+	return min(bay_limit, technician_limit)
+
+
+class ServicePlanner:
+	"""
+	Daily service capacity and load between start and end, inclusive.
+
+	The whole range is loaded with two queries (one aggregate over
+	ServiceBooking and the capacity overrides), after which every lookup is
+	a dictionary access, so planning over a year costs the same as a week.
+	"""
+
+	def __init__(self, start, end):
+		self.start = start
+		self.end = end
+		self._load = dict(
+			ServiceBooking.objects.filter(preferred_date__range=(start, end))
+			.order_by()
+			.values('preferred_date')
+			.annotate(count=Count('id'))
+			.values_list('preferred_date', 'count')
+		)
+		self._capacity = {
+			override.date: bookings_per_day(override.bays, override.technician_hours)
+			for override in ServiceDayCapacity.objects.filter(date__range=(start, end))
+		}
+		self._default_capacity = bookings_per_day(settings.SERVICE_BAYS, settings.SERVICE_TECHNICIAN_HOURS)
+
+	def days(self):
+		for offset in range((self.end - self.start).days + 1):
+			yield self.start + timedelta(days=offset)
+
+	def capacity(self, day):
+		if day in self._capacity:
+			return self._capacity[day]
+		if day.weekday() in settings.SERVICE_CLOSED_WEEKDAYS:
+			return 0
+		return self._default_capacity
+
+	def load(self, day):
+		return self._load.get(day, 0)
+
+	def free(self, day):
+		return self.capacity(day) - self.load(day)
+
+	def book(self, day, count=1):
+		"""Account for bookings added to day without reloading"""
+		self._load[day] = self.load(day) + count
+
+	def next_available(self, limit=None):
+		"""Return [(date, free), ...] for days with spare capacity, earliest first"""
+		if limit is not None and limit < 1:
+			raise ValueError('limit must be a positive number of days')
+		available = []
+		for day in self.days():
+			free = self.free(day)
+			if free > 0:
+				available.append((day, free))
+				if limit is not None and len(available) >= limit:
+					break
+		return available
+
+	def overflowing(self):
+		"""Return the days whose load exceeds their capacity"""
+		return [day for day, count in sorted(self._load.items()) if count > self.capacity(day)]
+
+
+def first_free_date(day):
+	"""Return the earliest date on or after day with spare capacity within the booking horizon"""
+	planner = ServicePlanner(day, day + timedelta(days=settings.SERVICE_BOOKING_DAYS - 1))
+	available = planner.next_available(limit=1)
+	return available[0][0] if available else None
+
+
+def reserve_service(day, **booking_fields):
+	"""
+	Create a ServiceBooking on day, linked to its customer, if the day still
+	has spare capacity.
+
+	The capacity check and the insert run in one transaction, which SQLite
+	starts IMMEDIATE (see DATABASES), so concurrent submissions are checked
+	one at a time and can never overbook a day. Returns (booking, None), or
+	(None, the first free date within the booking horizon or None).
+	"""
+	with transaction.atomic():
+		free_date = first_free_date(day)
+		if free_date != day:
+			return None, free_date
+		return create_lead(ServiceBooking, preferred_date=day, **booking_fields), None
+
+
+def plan_rebalance(start, end):
+	"""
+	Greedily move the latest bookings off each overflowing day in start..end
+	onto the nearest later day with spare capacity.
+
+	Bookings are kept first come, first served: the earliest-created ones on a
+	day stay put. The target cursor only moves forward, so the pass is linear
+	in the number of days plus moved bookings. Returns [(booking, new_date)].
+	"""
+	horizon = end + timedelta(days=settings.SERVICE_BOOKING_DAYS)
+	planner = ServicePlanner(start, horizon)
+	overflowing = [day for day in planner.overflowing() if day <= end]
+	if not overflowing:
+		return []
+
+	bookings = {}
+	for booking in ServiceBooking.objects.filter(preferred_date__in=overflowing).order_by('preferred_date', 'created_at', 'id'):
+		bookings.setdefault(booking.preferred_date, []).append(booking)
+
+	moves = []
+	cursor = start
+	for day in overflowing:
+		excess = bookings[day][max(planner.capacity(day), 0):]
+		cursor = max(cursor, day + timedelta(days=1))
+		for booking in excess:
+			while cursor <= horizon and planner.free(cursor) <= 0:
+				cursor += timedelta(days=1)
+			if cursor > horizon:
+				return moves
+			planner.book(cursor)
+			planner.book(day, -1)
+			moves.append((booking, cursor))
+	return moves
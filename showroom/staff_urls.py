@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import staff_views
+
+urlpatterns = [
+    path('api/analytics/leads', staff_views.lead_analytics, name='lead_analytics'),
+    path('api/bikes/as-of', staff_views.catalog_history, name='catalog_history'),
+    path('__perf__', staff_views.perf_report, name='perf_report'),
+]
@@ -0,0 +1,47 @@
+"""Staff-only reporting endpoints, kept out of the public views so public workers never import the admin"""
+from datetime import datetime, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .analytics import lead_summary
+from .catalog import _bike_to_dict
+from .history import catalog_as_of
+from .profiling import perf_store
+
+
+@staff_member_required
+def lead_analytics(request):
+	"""Admin-only lead counts for a date range, answered from the daily rollups"""
+	end = timezone.localdate()
+	start = end - timedelta(days=29)
+	try:
+		if request.GET.get('start'):
+			start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+		if request.GET.get('end'):
+			end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date()
+	except ValueError:
+		return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+
+	summary = lead_summary(start, end, bike_slug=request.GET.get('bike'), lead_type=request.GET.get('type'))
+	return JsonResponse({'start': start.isoformat(), 'end': end.isoformat(), **summary})
+
+
+@staff_member_required
+def catalog_history(request):
+	"""Admin-only catalog as it stood at the end of a given day, rebuilt from the bike history"""
+	try:
+		day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+	except ValueError:
+		return JsonResponse({'error': 'date must be in YYYY-MM-DD format'}, status=400)
+
+	moment = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time())) - timedelta(microseconds=1)
+	bikes = catalog_as_of(moment, bike_slug=request.GET.get('bike'))
+	return JsonResponse({'asOf': moment.isoformat(), 'bikes': [_bike_to_dict(bike, with_stock=False) for bike in bikes]})
+
+
+@staff_member_required
+def perf_report(request):
+	"""Admin-only dump of the per-view profiling histograms"""
+	return JsonResponse({'views': perf_store.snapshot()})
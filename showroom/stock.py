@@ -0,0 +1,159 @@
+"""Per-branch, per-colour bike stock and the in-memory availability index built from it"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .changefeed import record_changes
+from .models import StockLevel, StockMovement
+
+
+def colour_key(colour):
+	return colour.strip().lower()
+
+
+def listed_colour(bike, colour):
+	"""Return colour as the bike lists it, so 'racing red' and 'Racing Red' share a level"""
+	return next(
+		(listed for listed in bike.get_colors_list() if colour_key(listed) == colour_key(colour)), colour.strip()
+	)
+
+
+class StockIndex:
+	"""
+	Units and an availability bitmap per bike, loaded with one query.
+
+	Every branch gets a bit; for each bike and colour the index keeps a mask
+	with the bits of the branches holding at least one unit, so "is it in
+	stock, and where" is a couple of integer operations on every card render.
+	Movements made in this process update the index directly, and it is
+	reloaded after STOCK_INDEX_TTL seconds to pick up movements made by other
+	workers.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._loaded_at = None
+		self._branches = {}
+		self._branch_bits = []
+		self._units = {}
+		self._masks = {}
+		self._colour_names = {}
+
+	def invalidate(self):
+		with self._lock:
+			self._loaded_at = None
+
+	def _ensure_loaded(self):
+		with self._lock:
+			if self._loaded_at is not None and time.monotonic() - self._loaded_at < settings.STOCK_INDEX_TTL:
+				return
+			self._branches, self._branch_bits = {}, []
+			self._units, self._masks, self._colour_names = {}, {}, {}
+			levels = StockLevel.objects.filter(branch__is_active=True).order_by().values_list(
+				'bike__slug', 'branch__slug', 'branch__name', 'colour', 'units'
+			)
+			for bike_slug, branch_slug, branch_name, colour, units in levels:
+				self._set(bike_slug, branch_slug, branch_name, colour, units)
+			self._loaded_at = time.monotonic()
+
+	def _set(self, bike_slug, branch_slug, branch_name, colour, units):
+		if branch_slug not in self._branches:
+			self._branches[branch_slug] = (len(self._branch_bits), branch_name)
+			self._branch_bits.append(branch_slug)
+		bit = 1 << self._branches[branch_slug][0]
+		key = colour_key(colour)
+		self._colour_names.setdefault(bike_slug, {}).setdefault(key, colour.strip())
+		self._units.setdefault(bike_slug, {}).setdefault(key, {})[branch_slug] = units
+		masks = self._masks.setdefault(bike_slug, {})
+		masks[key] = masks.get(key, 0) | bit if units > 0 else masks.get(key, 0) & ~bit
+
+	def record(self, bike_slug, branch_slug, branch_name, colour, units):
+		"""Store the units left after a movement made in this process"""
+		with self._lock:
+			self._set(bike_slug, branch_slug, branch_name, colour, units)
+
+	def _branches_in(self, mask):
+		return [slug for bit, slug in enumerate(self._branch_bits) if mask >> bit & 1]
+
+	def availability(self, bike_slug, colours):
+		"""
+		Return {'inStock': bool, 'colors': [{'name', 'inStock', 'branches'}]} for a bike,
+		covering its listed colours followed by any other colour held in stock
+		"""
+		self._ensure_loaded()
+		with self._lock:
+			masks = self._masks.get(bike_slug, {})
+			names = self._colour_names.get(bike_slug, {})
+			listed = [colour_key(colour) for colour in colours]
+			entries = [
+				(name, masks.get(key, 0))
+				for name, key in zip(colours, listed)
+			] + [(names[key], mask) for key, mask in masks.items() if key not in listed]
+			return {
+				'inStock': any(mask for _, mask in entries),
+				'colors': [
+					{'name': name, 'inStock': bool(mask), 'branches': self._branches_in(mask)}
+					for name, mask in entries
+				],
+			}
+
+	def snapshot(self, bike_slug=None, branch_slug=None):
+		"""Return (branches, {bike_slug: {colour: {branch_slug: units}}}) for one bike and branch or all"""
+		self._ensure_loaded()
+		with self._lock:
+			branches = {
+				slug: name for slug, (_, name) in self._branches.items()
+				if branch_slug in (None, slug)
+			}
+			bikes = {}
+			for slug, colours in self._units.items():
+				if bike_slug not in (None, slug):
+					continue
+				bikes[slug] = {
+					self._colour_names[slug][key]: {branch: units for branch, units in held.items() if branch in branches}
+					for key, held in colours.items()
+				}
+		return branches, bikes
+
+
+stock_index = StockIndex()
+
+
+def record_movement(bike, branch, colour, change, reason, note=''):
+	"""
+	Apply a stock movement to the branch's units of bike in colour and log it.
+
+	The level is changed with a conditional UPDATE, so concurrent sales can
+	never take it below zero. Returns the StockMovement, or None when the
+	branch does not hold enough units; nothing is written in that case.
+	"""
+	colour = listed_colour(bike, colour)
+	with transaction.atomic():
+		if change < 0:
+			# Only an existing level can be taken from; creating one here would
+			# leave an empty row behind when the sale is refused.
+			level = StockLevel.objects.filter(bike=bike, branch=branch, colour=colour).first()
+			if level is None:
+				return None
+		else:
+			level, _ = StockLevel.objects.get_or_create(bike=bike, branch=branch, colour=colour)
+		changed = StockLevel.objects.filter(pk=level.pk, units__gte=-change).update(units=F('units') + change)
+		if not changed:
+			return None
+		level.refresh_from_db(fields=['units'])
+		movement = StockMovement.objects.create(
+			bike=bike, branch=branch, colour=colour, change=change,
+			units_after=level.units, reason=reason, note=note,
+		)
+		# Kiosks syncing the change feed pick up the new availability with the bike.
+		record_changes([bike])
+	if branch.is_active:
+		stock_index.record(bike.slug, branch.slug, branch.name, colour, level.units)
+	# The catalog payload carries stock availability. Imported here because
+	# the catalog module imports this one.
+	from .catalog import catalog_snapshot
+	transaction.on_commit(catalog_snapshot.invalidate)
+	return movement
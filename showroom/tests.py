@@ -1,3 +1,892 @@
-from django.test import TestCase
+import asyncio
+import json
+import sqlite3
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from backend import settings_public
+
+from . import benchmarks
+from .antispam import SQLiteTokenBucketLimiter, form_limiter, spam_score
+from .availability import availability_index
+from .catalog import catalog_snapshot
+from .changefeed import latest_version
+from .dedupe import contact_keys, match_customer, normalize_email, normalize_phone
+from .history import bike_states, catalog_as_of
+from .models import ArchivedLead, Bike, BikeVersion, Branch, CatalogChange, ContactInquiry, Customer, CustomerContactKey, LeadDailyRollup, Offer, ServiceBooking, ServiceDayCapacity, StockLevel, StockMovement, TestRideRequest, TestRideSlot
+from .pricing import apply_price_revision, parse_price_sheet, price_diff
+from .profiling import install_hooks, perf_store, uninstall_hooks
+from .routers import PRIMARY_DB, REPLICA_DB, CatalogReplicaRouter
+from .service_planner import ServicePlanner, reserve_service
+from .staff_urls import urlpatterns as staff_urlpatterns
+from .stock import record_movement, stock_index
+from .urls import urlpatterns
+from .warmup import warm_caches
+
+# Catalog sizes every budget is checked at; a budget that holds at all of
+# them means the view's query count does not grow with the catalog.
+CATALOG_SIZES = (5, 50, 200)
+
+# Maximum queries per request for each public showroom URL name.
+PUBLIC_QUERY_BUDGETS = {
+	'home': 2,
+	'about': 2,
+	'models': 2,
+	'model_detail': 2,
+	'offers': 3,
+	'book_test_ride': 2,
+	'contact': 2,
+	'gallery': 2,
+	'service': 2,
+	'bikes_json': 2,
+	'catalog_changes': 3,
+	'test_ride_slots': 2,
+	'stock': 1,
+	'service_availability': 2,
+	'test_ride_submit': 19,
+	'contact_submit': 11,
+	'service_submit': 13,
+}
+
+# Maximum queries per request for staff-only URL names, including the
+# session and user lookups.
+STAFF_QUERY_BUDGETS = {
+	'perf_report': 2,
+	'lead_analytics': 3,
+	'catalog_history': 3,
+	'admin:showroom_bike_changelist': 7,
+	'admin:showroom_offer_changelist': 7,
+	'admin:showroom_testriderequest_changelist': 8,
+	'admin:showroom_contactinquiry_changelist': 8,
+	'admin:showroom_servicebooking_changelist': 8,
+	'admin:showroom_customer_changelist': 7,
+	'admin:showroom_archivedlead_changelist': 9,
+	'admin:showroom_bikeversion_changelist': 9,
+	'admin:showroom_branch_changelist': 5,
+	'admin:showroom_stocklevel_changelist': 7,
+	'admin:showroom_stockmovement_changelist': 9,
+	'admin:showroom_bike_revise_prices': 2,
+}
+
+FORM_POSTS = {
+	'test_ride_submit': lambda slug: {
+		'model': slug, 'date': (timezone.localdate() + timedelta(days=1)).isoformat(), 'time': '10:30',
+		'name': 'Budget Rider', 'email': 'budget@example.com', 'phone': '9800000000',
+	},
+	'contact_submit': lambda slug: {
+		'model': slug, 'name': 'Budget Rider', 'email': 'budget@example.com', 'phone': '9800000000',
+	},
+	'service_submit': lambda slug: {
+		'model': slug, 'date': (timezone.localdate() + timedelta(days=benchmarks.LEAD_DAYS)).isoformat(),
+		'name': 'Budget Rider', 'phone': '9800000000',
+	},
+}
+
+
+QUERY_PARAMS = {
+	'test_ride_slots': lambda slug: {'bike': slug},
+	'catalog_history': lambda slug: {'date': timezone.localdate().isoformat()},
+}
+
+
+class QueryBudgetMixin:
+	"""Assertions for keeping a request within a fixed number of queries"""
+
+	def assertMaxQueries(self, budget, func, msg=''):
+		with CaptureQueriesContext(connection) as captured:
+			result = func()
+		if len(captured) > budget:
+			queries = '\n'.join(query['sql'] for query in captured.captured_queries)
+			self.fail(f'{msg}: {len(captured)} queries, budget is {budget}\n{queries}')
+		return result
+
+	def request_url(self, name, slug):
+		kwargs = {'slug': slug} if name == 'model_detail' else {}
+		url = reverse(name, kwargs=kwargs)
+		if name in FORM_POSTS:
+			return self.client.post(url, FORM_POSTS[name](slug))
+		params = QUERY_PARAMS[name](slug) if name in QUERY_PARAMS else {}
+		return self.client.get(url, params)
+
+
+class ShowroomTestCase(TestCase):
+	"""TestCase that starts every test with empty form rate-limit buckets and no cached catalog or stock"""
+
+	def setUp(self):
+		super().setUp()
+		form_limiter.reset()
+		catalog_snapshot.invalidate()
+		stock_index.invalidate()
+
+
+class CatalogReplicaRouterTests(SimpleTestCase):
+
+	router = CatalogReplicaRouter()
+
+	def test_catalog_reads_fall_back_to_the_primary_without_a_replica(self):
+		with mock.patch.dict(connections.databases):
+			connections.databases.pop(REPLICA_DB, None)
+			self.assertEqual(self.router.db_for_read(Bike), PRIMARY_DB)
+			self.assertEqual(self.router.db_for_read(Offer), PRIMARY_DB)
+
+	def test_only_catalog_reads_go_to_the_replica(self):
+		with mock.patch.dict(connections.databases, {REPLICA_DB: {}}):
+			self.assertEqual(self.router.db_for_read(Bike), REPLICA_DB)
+			self.assertEqual(self.router.db_for_read(CatalogChange), REPLICA_DB)
+			self.assertEqual(self.router.db_for_read(ContactInquiry), PRIMARY_DB)
+			self.assertEqual(self.router.db_for_read(get_user_model()), PRIMARY_DB)
+			self.assertEqual(self.router.db_for_write(Bike), PRIMARY_DB)
+			self.assertEqual(self.router.db_for_write(ContactInquiry), PRIMARY_DB)
+
+	def test_migrations_never_run_on_the_replica(self):
+		self.assertTrue(self.router.allow_migrate(PRIMARY_DB, 'showroom', 'bike'))
+		self.assertFalse(self.router.allow_migrate(REPLICA_DB, 'showroom', 'bike'))
+		self.assertFalse(self.router.allow_migrate(REPLICA_DB, 'auth'))
+
+	def test_refresh_snapshots_the_primary(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			primary, replica = f'{tmp}/primary.sqlite3', f'{tmp}/replica.sqlite3'
+			with sqlite3.connect(primary) as conn:
+				conn.execute("CREATE TABLE showroom_bike (slug TEXT)")
+				conn.execute("INSERT INTO showroom_bike VALUES ('pulsar-n160')")
+			conn.close()
+			with mock.patch.dict(connections.databases[PRIMARY_DB], {'NAME': primary}), override_settings(CATALOG_REPLICA_PATH=replica):
+				call_command('refresh_catalog_replica', stdout=StringIO())
+			conn = sqlite3.connect(replica)
+			self.assertEqual(conn.execute('SELECT slug FROM showroom_bike').fetchall(), [('pulsar-n160',)])
+			conn.close()
+
+
+@override_settings(PERF_PROFILING_ENABLED=True, PERF_SAMPLE_RATE=1.0)
+class PerfMiddlewareTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		install_hooks()
+		self.addCleanup(uninstall_hooks)
+		perf_store.clear()
+		self.addCleanup(perf_store.clear)
+		Bike.objects.create(slug='pulsar-n160', name='Pulsar N160')
+
+	def test_sampled_request_records_queries_and_templates(self):
+		with CaptureQueriesContext(connection) as captured:
+			response = self.client.get(reverse('home'))
+		self.assertIn(f'desc="{len(captured)} queries"', response['Server-Timing'])
+		self.assertIn('tpl;dur=', response['Server-Timing'])
+		home = perf_store.snapshot()['home']
+		self.assertEqual((home['samples'], home['db_queries']['max']), (1, len(captured)))
+		self.assertGreater(home['template_ms']['max'], 0)
+		self.assertEqual(home['bytes']['max'], len(response.content))
+
+
+class QueryBudgetTests(QueryBudgetMixin, ShowroomTestCase):
+
+	def test_every_showroom_url_has_a_budget(self):
+		self.assertEqual({pattern.name for pattern in urlpatterns}, set(PUBLIC_QUERY_BUDGETS))
+		staff_names = {name for name in STAFF_QUERY_BUDGETS if not name.startswith('admin:')}
+		self.assertEqual({pattern.name for pattern in staff_urlpatterns}, staff_names)
+
+	def test_public_views_stay_within_budget(self):
+		for size in CATALOG_SIZES:
+			bikes = benchmarks.seed_catalog(size)
+			slug = bikes[-1].slug
+			for name, budget in PUBLIC_QUERY_BUDGETS.items():
+				with self.subTest(url=name, size=size):
+					response = self.assertMaxQueries(budget, lambda: self.request_url(name, slug), f'{name} at {size} bikes')
+					self.assertIn(response.status_code, (200, 302))
+
+	def test_staff_views_stay_within_budget(self):
+		user = get_user_model().objects.create_superuser('budget', 'budget@example.com', 'budget')
+		self.client.force_login(user)
+		for size in CATALOG_SIZES:
+			bikes = benchmarks.seed_catalog(size)
+			benchmarks.seed_leads(size, [bike.slug for bike in bikes])
+			for name, budget in STAFF_QUERY_BUDGETS.items():
+				with self.subTest(url=name, size=size):
+					response = self.assertMaxQueries(budget, lambda: self.request_url(name, bikes[-1].slug), f'{name} at {size} bikes')
+					self.assertEqual(response.status_code, 200)
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+
+	baseline = {'20': {'home': {'p95_ms': 10.0, 'queries': 2}, 'offers': {'p95_ms': 4.0, 'queries': 3}}}
+
+	def result(self, home_ms, home_queries=2):
+		return {'20': {
+			'home': {'p95_ms': home_ms, 'queries': home_queries},
+			'offers': {'p95_ms': 4.0, 'queries': 3},
+			'stock': {'p95_ms': 90.0, 'queries': 9},
+		}}
+
+	def test_slowdown_within_the_threshold_passes(self):
+		self.assertEqual(benchmarks.compare(self.result(12.5), self.baseline, 0.25), [])
+		self.assertEqual(benchmarks.compare(self.result(8.0, home_queries=1), self.baseline, 0.25), [])
+
+	def test_slowdown_past_the_threshold_or_extra_queries_fail(self):
+		self.assertEqual(benchmarks.compare(self.result(12.6), self.baseline, 0.25), ['20/home: p95 10.0ms -> 12.6ms'])
+		self.assertEqual(benchmarks.compare(self.result(10.0, home_queries=3), self.baseline, 0.25), ['20/home: 2 -> 3 queries'])
+
+	def test_committed_baseline_covers_every_benchmarked_url(self):
+		with open(settings.BASE_DIR / 'benchmarks' / 'baseline.json', encoding='utf-8') as f:
+			baseline = json.load(f)
+		names = {pattern.name for pattern in urlpatterns} | {'import_bikes'}
+		for size, entries in baseline.items():
+			self.assertEqual(set(entries), names, size)
+
+
+class TestRideSlotTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.bike = Bike.objects.create(slug='pulsar-n160', name='Pulsar N160', demo_units=2)
+		self.tomorrow = timezone.localdate() + timedelta(days=1)
+		availability_index.invalidate()
+
+	def book(self, time='10:30', date=None):
+		return self.client.post(reverse('test_ride_submit'), {
+			'model': self.bike.slug, 'date': (date or self.tomorrow).isoformat(), 'time': time,
+			'name': 'Rider', 'email': 'rider@example.com', 'phone': '9800000000',
+		})
+
+	def free_units(self, start='10:00'):
+		response = self.client.get(reverse('test_ride_slots'), {'bike': self.bike.slug})
+		day = next(day for day in response.json()['days'] if day['date'] == self.tomorrow.isoformat())
+		return {slot['time']: slot['remaining'] for slot in day['slots']}.get(start, 0)
+
+	def test_booking_reserves_the_covering_slot(self):
+		self.assertEqual(self.free_units(), 2)
+		self.book('10:30')
+		slot = TestRideSlot.objects.get()
+		self.assertEqual((slot.start_time.hour, slot.booked, slot.capacity), (10, 1, 2))
+		self.assertEqual(TestRideRequest.objects.get().slot, slot)
+		self.assertEqual(self.free_units(), 1)
+
+	def test_full_slot_is_rejected(self):
+		for _ in range(3):
+			self.book()
+		self.assertEqual(TestRideRequest.objects.count(), 2)
+		self.assertEqual(TestRideSlot.objects.get().booked, 2)
+		self.assertEqual(self.free_units(), 0)
+
+	def test_times_outside_showroom_hours_are_rejected(self):
+		self.book('21:00')
+		self.assertFalse(TestRideRequest.objects.exists())
+
+	def test_slots_that_have_started_are_rejected(self):
+		now = timezone.localtime().replace(hour=15, minute=30)
+		with mock.patch('django.utils.timezone.localtime', return_value=now):
+			self.book('14:30', date=now.date())
+			self.book('15:45', date=now.date())
+			self.assertFalse(TestRideRequest.objects.exists())
+			self.book('16:30', date=now.date())
+		self.assertEqual(TestRideRequest.objects.get().slot.start_time.hour, 16)
+
+	def test_deleting_a_request_frees_its_unit(self):
+		self.book()
+		self.book()
+		self.assertEqual(self.free_units(), 0)
+		self.client.force_login(get_user_model().objects.create_superuser('staff', 'staff@example.com', 'staff'))
+		ride = TestRideRequest.objects.first()
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.post(reverse('admin:showroom_testriderequest_delete', args=[ride.pk]), {'post': 'yes'})
+		self.assertEqual(TestRideSlot.objects.get().booked, 1)
+		self.assertEqual(self.free_units(), 1)
+
+
+@override_settings(SERVICE_BAYS=1, SERVICE_TECHNICIAN_HOURS=8, SERVICE_WORKDAY_HOURS=8, SERVICE_HOURS_PER_BOOKING=4, SERVICE_CLOSED_WEEKDAYS=[])
+class ServicePlannerTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		Bike.objects.create(slug='pulsar-n160', name='Pulsar N160')
+		self.day = timezone.localdate() + timedelta(days=1)
+
+	def add_bookings(self, day, count):
+		for i in range(count):
+			ServiceBooking.objects.create(name=f'Rider {i}', phone='9800000000', bike_slug='pulsar-n160', preferred_date=day)
+
+	def test_full_day_is_rejected_with_next_free_date(self):
+		self.add_bookings(self.day, 2)
+		response = self.client.post(reverse('service_submit'), {
+			'model': 'pulsar-n160', 'date': self.day.isoformat(), 'name': 'Rider', 'phone': '9800000000',
+		}, follow=True)
+		self.assertContains(response, 'fully booked')
+		self.assertEqual(ServiceBooking.objects.count(), 2)
+
+	def test_availability_skips_full_days_and_overrides(self):
+		self.add_bookings(self.day, 2)
+		ServiceDayCapacity.objects.create(date=self.day + timedelta(days=1), bays=0, technician_hours=0)
+		dates = [entry['date'] for entry in self.client.get(reverse('service_availability')).json()['dates']]
+		self.assertNotIn(self.day.isoformat(), dates)
+		self.assertNotIn((self.day + timedelta(days=1)).isoformat(), dates)
+		self.assertIn((self.day + timedelta(days=2)).isoformat(), dates)
+
+	def test_reservation_checks_capacity_with_the_insert(self):
+		fields = {'name': 'Rider', 'phone': '9800000000', 'bike_slug': 'pulsar-n160'}
+		self.assertIsNotNone(reserve_service(self.day, **fields)[0])
+		self.assertIsNotNone(reserve_service(self.day, **fields)[0])
+		self.assertEqual(reserve_service(self.day, **fields), (None, self.day + timedelta(days=1)))
+		self.assertEqual(ServiceBooking.objects.filter(preferred_date=self.day).count(), 2)
+
+	def test_availability_limit_is_clamped(self):
+		for limit, expected in (('0', 1), ('-5', 1), ('3', 3), ('1000', settings.SERVICE_BOOKING_DAYS), ('x', 7)):
+			with self.subTest(limit=limit):
+				dates = self.client.get(reverse('service_availability'), {'limit': limit}).json()['dates']
+				self.assertEqual(len(dates), expected)
+		with self.assertRaises(ValueError):
+			ServicePlanner(self.day, self.day).next_available(limit=0)
+
+	def test_rebalance_moves_latest_bookings_forward(self):
+		self.add_bookings(self.day, 5)
+		self.add_bookings(self.day + timedelta(days=1), 1)
+		call_command('rebalance_service_bookings', start=self.day.isoformat(), days=7, stdout=StringIO())
+		load = {}
+		for booking in ServiceBooking.objects.order_by('id'):
+			load[booking.preferred_date] = load.get(booking.preferred_date, 0) + 1
+		self.assertEqual(list(load.values()), [2, 2, 2])
+		moved = ServiceBooking.objects.filter(rescheduled_from=self.day)
+		self.assertEqual(sorted(b.name for b in moved), ['Rider 2', 'Rider 3', 'Rider 4'])
+
+
+class LeadDedupeTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		Bike.objects.create(slug='pulsar-n160', name='Pulsar N160')
+
+	def test_normalization(self):
+		for phone in ('98765 43210', '+91-98765-43210', '09876543210', '0091 9876543210'):
+			self.assertEqual(normalize_phone(phone), '9876543210')
+		self.assertEqual(normalize_phone('12345'), '')
+		self.assertEqual(normalize_email(' Ravi.Kumar+bajaj@GoogleMail.com '), 'ravikumar@gmail.com')
+		self.assertEqual(normalize_email('not-an-email'), '')
+
+	def test_submissions_with_different_formatting_share_a_customer(self):
+		self.client.post(reverse('contact_submit'), {
+			'model': 'pulsar-n160', 'name': 'Ravi', 'email': 'Ravi.Kumar@gmail.com', 'phone': '+91 98765 43210',
+		})
+		self.client.post(reverse('service_submit'), {
+			'model': 'pulsar-n160', 'date': (timezone.localdate() + timedelta(days=1)).isoformat(),
+			'name': 'Ravi K', 'phone': '098765-43210',
+		})
+		self.assertEqual(Customer.objects.count(), 1)
+		customer = Customer.objects.get()
+		self.assertEqual(ContactInquiry.objects.get().customer, customer)
+		self.assertEqual(ServiceBooking.objects.get().customer, customer)
+
+	def test_lead_linking_two_customers_merges_them(self):
+		self.client.post(reverse('contact_submit'), {'name': 'A', 'email': 'a@example.com', 'phone': '9800000001'})
+		self.client.post(reverse('contact_submit'), {'name': 'B', 'email': 'b@example.com', 'phone': '9800000002'})
+		self.assertEqual(Customer.objects.count(), 2)
+		self.client.post(reverse('contact_submit'), {'name': 'A', 'email': 'A@example.com', 'phone': '9800000002'})
+		self.assertEqual(Customer.objects.count(), 1)
+		self.assertEqual(set(ContactInquiry.objects.values_list('customer', flat=True)), {Customer.objects.get().pk})
+
+	def test_rejected_test_ride_creates_no_customer(self):
+		Bike.objects.filter(slug='pulsar-n160').update(demo_units=1)
+		catalog_snapshot.invalidate()
+		tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+		for phone in ('9800000001', '9800000002'):
+			self.client.post(reverse('test_ride_submit'), {
+				'model': 'pulsar-n160', 'date': tomorrow, 'time': '10:30', 'name': 'Rider', 'phone': phone,
+			})
+		self.assertEqual(TestRideRequest.objects.count(), 1)
+		self.assertEqual(list(Customer.objects.values_list('phone', flat=True)), ['9800000001'])
+		self.assertEqual(CustomerContactKey.objects.count(), 1)
+
+	def test_concurrent_first_submission_reuses_the_winning_customer(self):
+		winner = Customer.objects.create(name='Winner', phone='9800000001')
+		CustomerContactKey.objects.create(key=contact_keys('9800000001', '')[0], customer=winner)
+		lookup = CustomerContactKey.objects.filter
+		stale = [CustomerContactKey.objects.none()]
+
+		def lookup_before_the_winner_committed(**kwargs):
+			return stale.pop() if stale else lookup(**kwargs)
+
+		with mock.patch.object(CustomerContactKey.objects, 'filter', side_effect=lookup_before_the_winner_committed):
+			customer = match_customer('Ravi', '98000 00001')
+		self.assertEqual(customer, winner)
+		self.assertEqual(Customer.objects.count(), 1)
+
+	def test_batch_dedupe_clusters_historical_leads(self):
+		ContactInquiry.objects.create(name='A', email='a@example.com', phone='9800000001')
+		TestRideRequest.objects.create(
+			name='A', email='A@Example.com', phone='98000 00009', bike_slug='pulsar-n160',
+			preferred_date=timezone.localdate(), preferred_time='10:00',
+		)
+		ServiceBooking.objects.create(name='A', phone='+919800000009', bike_slug='pulsar-n160', preferred_date=timezone.localdate())
+		ServiceBooking.objects.create(name='C', phone='9800000003', bike_slug='pulsar-n160', preferred_date=timezone.localdate())
+		call_command('dedupe_leads', stdout=StringIO())
+		self.assertEqual(Customer.objects.count(), 2)
+		self.assertEqual(ContactInquiry.objects.get().customer, TestRideRequest.objects.get().customer)
+		self.assertEqual(
+			set(ServiceBooking.objects.values_list('customer', flat=True)),
+			{TestRideRequest.objects.get().customer_id, Customer.objects.get(name='C').pk},
+		)
+
+	def test_batched_dedupe_keeps_existing_customers(self):
+		self.client.post(reverse('contact_submit'), {'name': 'A', 'email': 'a@example.com', 'phone': '9800000001'})
+		self.client.post(reverse('contact_submit'), {'name': 'B', 'email': 'b@example.com', 'phone': '9800000002'})
+		first, second = ContactInquiry.objects.order_by('created_at', 'id')
+		customer = first.customer
+		ContactInquiry.objects.filter(pk=second.pk).update(customer=customer)
+		ServiceBooking.objects.create(name='A', phone='+91 98000 00001', bike_slug='pulsar-n160', preferred_date=timezone.localdate())
+		Customer.objects.create(name='Nobody', phone='9800000009')
+
+		call_command('dedupe_leads', batch_size=1, stdout=StringIO())
+		second.refresh_from_db()
+		self.assertEqual(ServiceBooking.objects.get().customer, customer)
+		self.assertNotEqual(second.customer, customer)
+		self.assertEqual(set(Customer.objects.values_list('pk', flat=True)), {customer.pk, second.customer_id})
+		self.assertEqual(match_customer('B', '9800000002', 'b@example.com'), second.customer)
+
+
+
+class LeadAnalyticsTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		Bike.objects.create(slug='pulsar-n160', name='Pulsar N160')
+		user = get_user_model().objects.create_superuser('staff', 'staff@example.com', 'staff')
+		self.client.force_login(user)
+
+	def test_rollups_follow_inserts_and_match_backfill(self):
+		self.client.post(
+			reverse('contact_submit'),
+			{'model': 'pulsar-n160', 'name': 'A', 'email': 'a@example.com', 'phone': '9800000001'},
+			HTTP_REFERER='http://testserver' + reverse('model_detail', kwargs={'slug': 'pulsar-n160'}),
+		)
+		self.client.post(reverse('contact_submit'), {'model': 'pulsar-n160', 'name': 'B', 'email': 'b@example.com', 'phone': '9800000002'})
+		ServiceBooking.objects.create(name='C', phone='9800000003', bike_slug='pulsar-n160', preferred_date=timezone.localdate())
+
+		summary = self.client.get(reverse('lead_analytics'), {'bike': 'pulsar-n160'}).json()
+		self.assertEqual(summary['total'], 3)
+		self.assertEqual(summary['by_type'], {'inquiry': 2, 'service': 1})
+		self.assertEqual(summary['by_source'], {'model_detail': 1, '': 2})
+
+		incremental = set(LeadDailyRollup.objects.values_list('date', 'lead_type', 'bike_slug', 'source', 'count'))
+		call_command('backfill_lead_rollups', stdout=StringIO())
+		self.assertEqual(set(LeadDailyRollup.objects.values_list('date', 'lead_type', 'bike_slug', 'source', 'count')), incremental)
+
+	def test_backfill_after_archiving_keeps_archived_leads(self):
+		self.client.post(reverse('contact_submit'), {'model': 'pulsar-n160', 'name': 'A', 'email': 'a@example.com', 'phone': '9800000001'})
+		ServiceBooking.objects.create(name='C', phone='9800000003', bike_slug='pulsar-n160', preferred_date=timezone.localdate())
+		call_command('archive_leads', days=0, stdout=StringIO())
+		self.client.post(reverse('contact_submit'), {'model': 'pulsar-n160', 'name': 'B', 'email': 'b@example.com', 'phone': '9800000002'})
+		incremental = set(LeadDailyRollup.objects.values_list('date', 'lead_type', 'bike_slug', 'source', 'count'))
+
+		call_command('backfill_lead_rollups', stdout=StringIO())
+		self.assertEqual(set(LeadDailyRollup.objects.values_list('date', 'lead_type', 'bike_slug', 'source', 'count')), incremental)
+		summary = self.client.get(reverse('lead_analytics'), {'bike': 'pulsar-n160'}).json()
+		self.assertEqual(summary['by_type'], {'inquiry': 2, 'service': 1})
+
+	def test_type_filter_and_bad_dates(self):
+		ServiceBooking.objects.create(name='C', phone='9800000003', bike_slug='pulsar-n160', preferred_date=timezone.localdate())
+		self.assertEqual(self.client.get(reverse('lead_analytics'), {'type': 'inquiry'}).json()['total'], 0)
+		self.assertEqual(self.client.get(reverse('lead_analytics'), {'start': 'yesterday'}).status_code, 400)
+
+
+class LeadArchivalTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		old = timezone.now() - timedelta(days=400)
+		for i in range(5):
+			ContactInquiry.objects.create(name=f'Old {i}', email=f'old{i}@example.com', phone='9800000001', message=f'Hi {i}')
+		ServiceBooking.objects.create(name='Old service', phone='9800000002', bike_slug='pulsar-n160', preferred_date=old.date())
+		ContactInquiry.objects.update(created_at=old)
+		ServiceBooking.objects.update(created_at=old)
+		ContactInquiry.objects.create(name='Recent', email='recent@example.com', phone='9800000003')
+
+	def test_old_leads_move_to_the_archive_in_batches(self):
+		call_command('archive_leads', days=365, batch_size=2, stdout=StringIO())
+		self.assertEqual(list(ContactInquiry.objects.values_list('name', flat=True)), ['Recent'])
+		self.assertFalse(ServiceBooking.objects.exists())
+		self.assertEqual(ArchivedLead.objects.filter(lead_type='inquiry').count(), 5)
+		service = ArchivedLead.objects.get(lead_type='service')
+		self.assertEqual(service.details['preferred_date'], (timezone.now() - timedelta(days=400)).date().isoformat())
+
+	def test_zero_days_archives_every_lead(self):
+		call_command('archive_leads', days=0, stdout=StringIO())
+		self.assertFalse(ContactInquiry.objects.exists())
+		self.assertEqual(ArchivedLead.objects.count(), 7)
+
+	def test_archived_leads_keep_their_customer_through_dedupe(self):
+		call_command('archive_leads', days=365, stdout=StringIO())
+		ContactInquiry.objects.create(name='Back again', phone='+91 98000 00001')
+		call_command('dedupe_leads', stdout=StringIO())
+		customer = ContactInquiry.objects.get(name='Back again').customer
+		self.assertIsNotNone(customer)
+		self.assertEqual(
+			set(ArchivedLead.objects.filter(lead_type='inquiry').values_list('customer', flat=True)), {customer.pk},
+		)
+		self.assertIsNotNone(ArchivedLead.objects.get(lead_type='service').customer)
+
+	def test_export_includes_archived_leads(self):
+		call_command('archive_leads', days=365, stdout=StringIO())
+		output = StringIO()
+		call_command('export_leads', type='inquiry', include_archived=True, stdout=output)
+		rows = output.getvalue().strip().splitlines()
+		self.assertEqual(len(rows), 1 + 6)
+		self.assertIn('Hi 0', output.getvalue())
+
+
+@override_settings(FORM_RATE_LIMIT=2)
+class FormProtectionTests(QueryBudgetMixin, ShowroomTestCase):
+
+	def post_contact(self, **fields):
+		data = {'name': 'Ravi', 'email': 'ravi@example.com', 'phone': '9876543210', 'message': 'Price of Pulsar?'}
+		data.update(fields)
+		return self.client.post(reverse('contact_submit'), data)
+
+	def test_genuine_inquiry_scores_low(self):
+		self.assertLess(spam_score({'name': 'Ravi Kumar', 'phone': '+91 98765 43210', 'message': 'Need EMI details'}), 5)
+
+	def test_spam_is_rejected_without_queries(self):
+		self.assertMaxQueries(0, lambda: self.post_contact(website='http://spam.example'), 'honeypot')
+		self.assertMaxQueries(0, lambda: self.post_contact(message='Best casino bonus http://x.example http://y.example'), 'spam words')
+		self.assertFalse(ContactInquiry.objects.exists())
+
+	def test_async_views_check_posts_off_the_event_loop(self):
+		on_event_loop = []
+
+		def rejection(request, form_name):
+			try:
+				asyncio.get_running_loop()
+				on_event_loop.append(True)
+			except RuntimeError:
+				on_event_loop.append(False)
+			return None
+
+		with mock.patch('showroom.antispam.rejection', side_effect=rejection):
+			self.post_contact()
+		self.assertEqual(on_event_loop, [False])
+
+	def test_burst_over_the_limit_is_rejected_without_queries(self):
+		self.post_contact()
+		self.post_contact(phone='9876543211')
+		self.assertMaxQueries(0, lambda: self.post_contact(phone='9876543212'), 'third post from one IP')
+		self.assertEqual(ContactInquiry.objects.count(), 2)
+
+	def test_locked_shared_buckets_fall_back_to_the_worker(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			limiter = SQLiteTokenBucketLimiter(2, 600, f'{tmp}/ratelimit.sqlite3')
+			limiter.lock_timeout = 0.01
+			self.assertTrue(limiter.allow('contact:ip:203.0.113.7'))
+			other = sqlite3.connect(f'{tmp}/ratelimit.sqlite3', isolation_level=None)
+			other.execute('BEGIN IMMEDIATE')
+			try:
+				with self.assertLogs('showroom.antispam', 'WARNING'):
+					self.assertEqual([limiter.allow('contact:ip:203.0.113.7') for _ in range(3)], [True, True, False])
+			finally:
+				other.execute('ROLLBACK')
+				other.close()
+				limiter._local.conn.close()
+
+	@override_settings(FORM_RATE_LIMIT_TRUSTED_PROXIES=1)
+	def test_spoofed_forwarded_for_does_not_reset_the_ip_bucket(self):
+		for number, phone in enumerate(('9876543210', '9876543211', '9876543212')):
+			self.client.post(reverse('contact_submit'), {
+				'name': 'Ravi', 'email': 'ravi@example.com', 'phone': phone, 'message': 'Price of Pulsar?',
+			}, HTTP_X_FORWARDED_FOR=f'10.0.0.{number}, 203.0.113.7')
+		self.assertEqual(ContactInquiry.objects.count(), 2)
+
+
+class CatalogChangeFeedTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.pulsar = Bike.objects.create(slug='pulsar-n160', name='Pulsar N160', ex_showroom_price=130000)
+		self.dominar = Bike.objects.create(slug='dominar-400', name='Dominar 400')
+		self.offer = Offer.objects.create(
+			title='Festive', description='Cashback', bike=self.pulsar,
+			valid_from=timezone.localdate(), valid_until=timezone.localdate() + timedelta(days=7),
+		)
+		self.version = latest_version()
+
+	def changes(self, since):
+		return self.client.get(reverse('catalog_changes'), {'since': since})
+
+	def test_only_changes_after_the_version_are_returned(self):
+		self.pulsar.ex_showroom_price = 125000
+		self.pulsar.save()
+		self.pulsar.save()
+		self.dominar.is_active = False
+		self.dominar.save()
+		offer_id = self.offer.pk
+		self.offer.delete()
+
+		body = self.changes(self.version).json()
+		self.assertEqual([bike['slug'] for bike in body['bikes']], ['pulsar-n160'])
+		self.assertEqual(body['bikes'][0]['price']['exShowroom'], 125000)
+		self.assertEqual(body['deletedBikes'], ['dominar-400'])
+		self.assertEqual(body['deletedOffers'], [offer_id])
+		self.assertEqual(body['version'], latest_version())
+
+		unchanged = self.changes(body['version']).json()
+		self.assertEqual((unchanged['version'], unchanged['bikes'], unchanged['deletedBikes']), (body['version'], [], []))
+
+	def test_renamed_bike_retires_its_old_slug(self):
+		self.pulsar.slug = 'pulsar-n160-abs'
+		self.pulsar.save()
+		self.pulsar.name = 'Pulsar N160 ABS'
+		self.pulsar.save()
+		call_command('compact_catalog_changes', stdout=StringIO())
+		body = self.changes(self.version).json()
+		self.assertEqual([bike['slug'] for bike in body['bikes']], ['pulsar-n160-abs'])
+		self.assertEqual(body['deletedBikes'], ['pulsar-n160'])
+		self.assertEqual(self.changes(0).json()['deletedBikes'], ['pulsar-n160'])
+
+	def test_compaction_keeps_the_deltas(self):
+		for price in (120000, 121000, 122000):
+			self.pulsar.ex_showroom_price = price
+			self.pulsar.save()
+		before = self.changes(0).json()
+		call_command('compact_catalog_changes', stdout=StringIO())
+		self.assertEqual(CatalogChange.objects.count(), 3)
+		self.assertEqual(self.changes(0).json(), before)
+
+	def test_bad_and_future_versions(self):
+		self.assertEqual(self.changes('abc').status_code, 400)
+		self.assertEqual(self.changes(self.version + 100).status_code, 410)
+
+
+@override_settings(BIKE_HISTORY_SNAPSHOT_EVERY=3)
+class BikeHistoryTests(ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.bike = Bike.objects.create(slug='pulsar-n160', name='Pulsar N160', ex_showroom_price=130000, emi='3,599/month')
+
+	def reprice(self, price, when):
+		self.bike.ex_showroom_price = price
+		self.bike.save()
+		BikeVersion.objects.filter(pk=BikeVersion.objects.order_by('-id').values('id')[:1]).update(recorded_at=when)
+
+	def test_edits_are_stored_as_diffs_with_periodic_snapshots(self):
+		self.bike.save()
+		self.assertEqual(BikeVersion.objects.count(), 1)
+		for price in (131000, 132000, 133000):
+			self.bike.ex_showroom_price = price
+			self.bike.save()
+		versions = list(BikeVersion.objects.order_by('id').values_list('is_snapshot', 'values'))
+		self.assertEqual([is_snapshot for is_snapshot, _ in versions], [True, False, False, True])
+		self.assertEqual(versions[0][1]['ex_showroom_price'], '130000.00')
+		self.assertEqual(versions[1][1], {'ex_showroom_price': '131000.00'})
+		values, _, diffs = bike_states([self.bike.pk])[self.bike.pk]
+		self.assertEqual((values['ex_showroom_price'], diffs), ('133000.00', 0))
+
+		self.bike.refresh_from_db()
+		self.bike.ex_showroom_price = 133000
+		self.bike.save()
+		self.assertEqual(BikeVersion.objects.count(), 4)
+
+	def test_catalog_as_of_a_past_date(self):
+		now = timezone.now()
+		BikeVersion.objects.update(recorded_at=now - timedelta(days=30))
+		self.reprice(135000, now - timedelta(days=20))
+		self.reprice(140000, now - timedelta(days=10))
+		Bike.objects.create(slug='dominar-400', name='Dominar 400')
+
+		past = catalog_as_of(now - timedelta(days=15))
+		self.assertEqual([(bike.slug, bike.ex_showroom_price) for bike in past], [('pulsar-n160', 135000)])
+		self.assertEqual(past[0].emi, '3,599/month')
+		self.assertEqual(catalog_as_of(now - timedelta(days=40)), [])
+		self.assertEqual(len(catalog_as_of(timezone.now())), 2)
+
+	def test_deleted_bikes_keep_their_history(self):
+		pk = self.bike.pk
+		self.bike.delete()
+		self.assertTrue(bike_states([pk])[pk][1])
+		self.assertEqual(catalog_as_of(timezone.now()), [])
+
+
+class WarmupTests(QueryBudgetMixin, ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.bike = Bike.objects.create(slug='pulsar-n160', name='Pulsar N160', ex_showroom_price=130000)
+
+	def test_warm_worker_serves_catalog_pages_without_queries(self):
+		self.assertEqual(set(warm_caches()), {'urls', 'catalog', 'availability', 'templates'})
+		for name in ('home', 'models', 'model_detail', 'bikes_json'):
+			with self.subTest(url=name):
+				response = self.assertMaxQueries(0, lambda: self.request_url(name, self.bike.slug), name)
+				self.assertEqual(response.status_code, 200)
+
+	def test_saving_a_bike_drops_the_snapshot(self):
+		warm_caches()
+		self.bike.ex_showroom_price = 125000
+		with self.captureOnCommitCallbacks(execute=True):
+			self.bike.save()
+		bikes = self.client.get(reverse('bikes_json')).json()['bikes']
+		self.assertEqual(bikes[0]['price']['exShowroom'], 125000)
+
+	def test_snapshot_is_dropped_when_the_write_commits(self):
+		warm_caches()
+		with self.captureOnCommitCallbacks(execute=True) as callbacks:
+			with transaction.atomic():
+				self.bike.ex_showroom_price = 125000
+				self.bike.save()
+				self.assertEqual(catalog_snapshot.get().bikes[self.bike.slug]['price']['exShowroom'], 130000)
+			self.assertEqual(catalog_snapshot.get().bikes[self.bike.slug]['price']['exShowroom'], 130000)
+		self.assertEqual(len(callbacks), 1)
+		self.assertEqual(catalog_snapshot.get().bikes[self.bike.slug]['price']['exShowroom'], 125000)
+
+
+class StockTests(QueryBudgetMixin, ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.bike = Bike.objects.create(slug='pulsar-n160', name='Pulsar N160', colors='Racing Red, Pearl White')
+		self.main = Branch.objects.create(slug='main', name='Main Road')
+		self.east = Branch.objects.create(slug='east', name='East Gate')
+		record_movement(self.bike, self.main, 'Racing Red', 3, 'receipt')
+
+	def availability(self):
+		return self.client.get(reverse('bikes_json')).json()['bikes'][0]['stock']
+
+	def test_movements_update_availability_without_reloading(self):
+		self.assertEqual(self.availability(), {
+			'inStock': True,
+			'colors': [
+				{'name': 'Racing Red', 'inStock': True, 'branches': ['main']},
+				{'name': 'Pearl White', 'inStock': False, 'branches': []},
+			],
+		})
+		with self.captureOnCommitCallbacks(execute=True):
+			record_movement(self.bike, self.east, 'pearl white ', 1, 'transfer_in')
+			record_movement(self.bike, self.main, 'Racing Red', -3, 'sale')
+		response = self.assertMaxQueries(0, lambda: self.client.get(reverse('stock'), {'bike': self.bike.slug}), 'stock')
+		self.assertEqual(response.json()['bikes'], {'pulsar-n160': {'Racing Red': {'main': 0}, 'Pearl White': {'east': 1}}})
+		self.assertEqual(
+			[(colour['name'], colour['branches']) for colour in self.availability()['colors']],
+			[('Racing Red', []), ('Pearl White', ['east'])],
+		)
+
+	def test_stock_never_goes_negative(self):
+		self.assertIsNone(record_movement(self.bike, self.main, 'Racing Red', -4, 'sale'))
+		self.assertEqual(StockLevel.objects.get(branch=self.main, colour='Racing Red').units, 3)
+		movement = record_movement(self.bike, self.main, 'Racing Red', -3, 'sale')
+		self.assertEqual(movement.units_after, 0)
+		self.assertEqual(StockMovement.objects.count(), 2)
+
+	def test_refused_sale_leaves_no_empty_level(self):
+		self.assertIsNone(record_movement(self.bike, self.east, 'Racing Red', -1, 'sale'))
+		self.assertFalse(StockLevel.objects.filter(branch=self.east).exists())
+
+	def test_admin_shows_a_refused_sale_on_the_form(self):
+		self.client.force_login(get_user_model().objects.create_superuser('staff', 'staff@example.com', 'staff'))
+		movement = {'bike': self.bike.pk, 'branch': self.main.pk, 'colour': 'racing red', 'change': -4, 'reason': 'sale'}
+		response = self.client.post(reverse('admin:showroom_stockmovement_add'), movement)
+		self.assertContains(response, 'Main Road only holds 3 units of Pulsar N160 in Racing Red.')
+		self.assertFalse(LogEntry.objects.exists())
+
+		# A sale that loses the race after clean() is neither logged nor reported as added.
+		with mock.patch('showroom.admin.record_movement', return_value=None):
+			response = self.client.post(reverse('admin:showroom_stockmovement_add'), {**movement, 'change': -1}, follow=True)
+		self.assertEqual(
+			[str(message) for message in response.context['messages']],
+			['Not enough units in stock; the movement was not recorded.'],
+		)
+		self.assertFalse(LogEntry.objects.exists())
+		self.assertEqual(StockMovement.objects.count(), 1)
+
+	def test_movements_reach_the_change_feed(self):
+		version = latest_version()
+		record_movement(self.bike, self.main, 'Racing Red', -1, 'sale')
+		body = self.client.get(reverse('catalog_changes'), {'since': version}).json()
+		self.assertEqual(body['bikes'][0]['stock']['colors'][0]['branches'], ['main'])
+
+
+class PriceRevisionTests(QueryBudgetMixin, ShowroomTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.pulsar = Bike.objects.create(slug='pulsar-n160', name='Pulsar N160', ex_showroom_price=130000, on_road_price=150000, emi='₹4,000/month')
+		self.dominar = Bike.objects.create(slug='dominar-400', name='Dominar 400', ex_showroom_price=230000)
+		user = get_user_model().objects.create_superuser('staff', 'staff@example.com', 'staff')
+		self.client.force_login(user)
+
+	def upload(self, sheet, **extra):
+		upload = SimpleUploadedFile('prices.csv', sheet.encode('utf-8-sig'), content_type='text/csv')
+		return self.client.post(reverse('admin:showroom_bike_revise_prices'), {'sheet': upload, **extra})
+
+	def test_preview_then_apply(self):
+		sheet = 'slug,ex_showroom_price,on_road_price,emi\npulsar-n160,"₹1,32,000",,"₹4,100/month"\ndominar-400,230000,,\nboxer-150,70000,,\n'
+		self.assertContains(self.client.get(reverse('admin:showroom_bike_changelist')), 'Revise prices')
+		preview = self.upload(sheet)
+		self.assertContains(preview, 'Apply 1 price changes')
+		self.assertContains(preview, 'boxer-150')
+		self.assertEqual([row[0] for row in preview.context['rows']], [self.pulsar])
+		self.pulsar.refresh_from_db()
+		self.assertEqual(self.pulsar.ex_showroom_price, 130000)
+
+		version = latest_version()
+		response = self.client.post(
+			reverse('admin:showroom_bike_revise_prices'), {'sheet_text': preview.context['form'].initial['sheet_text'], 'apply': '1'},
+		)
+		self.assertRedirects(response, reverse('admin:showroom_bike_changelist'))
+		self.pulsar.refresh_from_db()
+		self.assertEqual((self.pulsar.ex_showroom_price, self.pulsar.on_road_price, self.pulsar.emi), (132000, 150000, '₹4,100/month'))
+		self.assertEqual(CatalogChange.objects.filter(version__gt=version).count(), 1)
+		entry = LogEntry.objects.get()
+		self.assertEqual((entry.user.username, entry.object_id, entry.action_flag), ('staff', str(self.pulsar.pk), CHANGE))
+		self.assertEqual(
+			entry.get_change_message(),
+			'Revised from a price sheet: Ex showroom price 130000.00 -> 132000.00, Emi ₹4,000/month -> ₹4,100/month.',
+		)
+		self.assertEqual(bike_states([self.pulsar.pk])[self.pulsar.pk][0]['ex_showroom_price'], '132000.00')
+		bikes = {bike['slug']: bike for bike in self.client.get(reverse('bikes_json')).json()['bikes']}
+		self.assertEqual(bikes['pulsar-n160']['price']['exShowroom'], 132000)
+
+	def test_invalid_rows_block_the_upload(self):
+		revisions, errors = parse_price_sheet('slug,ex_showroom_price\npulsar-n160,cheap\npulsar-n160,1\n')
+		self.assertEqual(len(errors), 2)
+		self.assertContains(self.upload('name,price\nPulsar,1\n'), 'needs a slug column')
+
+	def test_full_lineup_is_one_bulk_write(self):
+		# Past a few hundred bikes SQLite's parameter limit splits the bulk
+		# statements into batches, so this covers lineup-sized sheets.
+		for size in CATALOG_SIZES[:2]:
+			bikes = benchmarks.seed_catalog(size)
+			revisions, _ = parse_price_sheet(
+				'slug,ex_showroom_price\n' + ''.join(f'{bike.slug},{bike.ex_showroom_price + 1000}\n' for bike in bikes)
+			)
+			changes, _ = price_diff(revisions)
+			with mock.patch.object(catalog_snapshot, 'invalidate') as invalidate, self.captureOnCommitCallbacks(execute=True):
+				self.assertMaxQueries(6, lambda: apply_price_revision(changes), f'revision of {size} bikes')
+			invalidate.assert_called_once_with()
+
+
+@override_settings(
+	ROOT_URLCONF=settings_public.ROOT_URLCONF,
+	MIDDLEWARE=settings_public.MIDDLEWARE,
+	TEMPLATES=settings_public.TEMPLATES,
+	MESSAGE_STORAGE=settings_public.MESSAGE_STORAGE,
+)
+class PublicProfileTests(ShowroomTestCase):
+
+	def test_forms_work_without_sessions_and_staff_urls_are_gone(self):
+		Bike.objects.create(slug='pulsar-n160', name='Pulsar N160')
+		response = self.client.post(
+			reverse('contact_submit'), {'name': 'Ravi', 'email': 'ravi@example.com', 'phone': '9876543210'}, follow=True,
+		)
+		self.assertContains(response, 'Thanks for reaching out')
+		self.assertNotIn('sessionid', self.client.cookies)
+		self.assertEqual(self.client.get('/admin/').status_code, 404)
+		self.assertEqual(self.client.get('/__perf__').status_code, 404)
 
-# Create your tests here.
@@ -13,6 +13,10 @@ urlpatterns = [
     path('gallery/', views.gallery, name='gallery'),
     path('service/', views.service, name='service'),
     path('api/bikes.json', views.bikes_json, name='bikes_json'),
+    path('api/bikes/changes', views.catalog_changes, name='catalog_changes'),
+    path('api/test-ride/slots', views.test_ride_slots, name='test_ride_slots'),
+    path('api/stock', views.stock, name='stock'),
+    path('api/service/availability', views.service_availability, name='service_availability'),
     path('forms/test-ride/', views.submit_test_ride, name='test_ride_submit'),
     path('forms/contact/', views.submit_contact, name='contact_submit'),
     path('forms/service/', views.submit_service, name='service_submit'),
@@ -1,69 +1,41 @@
-import json
-from datetime import datetime
-from functools import lru_cache
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.templatetags.static import static
-from django.urls import reverse
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
 
-from .models import Bike, ContactInquiry, Offer, ServiceBooking, TestRideRequest
+from .antispam import protect_form
+from .availability import availability_index, booking_window, reserve_test_ride, slot_has_started, slot_start_for
+from .catalog import _bike_to_dict, catalog_snapshot
+from .changefeed import changes_since
+from .dedupe import create_lead
+from .models import Bike, ContactInquiry, Offer
+from .service_planner import ServicePlanner, reserve_service
+from .stock import stock_index
 
 
-def _bike_map():
-	"""Return a dictionary mapping bike slugs to bike objects"""
-	bikes = Bike.objects.filter(is_active=True)
-	return {bike.slug: _bike_to_dict(bike) for bike in bikes}
-
-
-def _bike_to_dict(bike):
-	"""Convert a Bike model instance to a dictionary matching the JSON structure"""
+def _offer_to_dict(offer):
+	"""Convert an Offer model instance to a dictionary for the catalog change feed"""
 	return {
-		'slug': bike.slug,
-		'name': bike.name,
-		'family': bike.family or '',
-		'isFeatured': bike.is_featured,
-		'heroImage': bike.hero_image or '',
-		'gallery': bike.get_gallery_list(),
-		'engine': {
-			'cc': float(bike.engine_cc) if bike.engine_cc else 0,
-			'ccCategory': bike.cc_category or '',
-			'power': bike.power or '',
-			'torque': bike.torque or '',
-			'cooling': bike.cooling or '',
-			'transmission': bike.transmission or '',
-		},
-		'performance': {
-			'mileage': bike.mileage or '',
-			'topSpeed': bike.top_speed or '',
-			'summary': bike.performance_summary or '',
-		},
-		'chassis': {
-			'frontBrake': bike.front_brake or '',
-			'rearBrake': bike.rear_brake or '',
-			'suspension': bike.suspension or '',
-			'weight': bike.weight or '',
-			'seatHeight': bike.seat_height or '',
-		},
-		'colors': bike.get_colors_list(),
-		'price': {
-			'exShowroom': float(bike.ex_showroom_price) if bike.ex_showroom_price else 0,
-			'onRoad': float(bike.on_road_price) if bike.on_road_price else 0,
-			'emi': bike.emi or '',
-		},
-		'features': bike.get_features_list(),
+		'id': offer.pk,
+		'title': offer.title,
+		'description': offer.description,
+		'bike': offer.bike.slug if offer.bike else None,
+		'discountPercentage': float(offer.discount_percentage) if offer.discount_percentage else 0,
+		'discountAmount': float(offer.discount_amount) if offer.discount_amount else 0,
+		'validFrom': offer.valid_from.isoformat(),
+		'validUntil': offer.valid_until.isoformat(),
+		'image': offer.image or '',
 	}
 
 
-def _bike_choices():
-	"""Return a list of bike choices for forms"""
-	bikes = Bike.objects.filter(is_active=True).order_by('name')
-	return [{'slug': bike.slug, 'name': bike.name} for bike in bikes]
-
-
-def _base_context():
+def _url_context():
 	return {
 		'static_prefix': static(''),
 		'data_url': reverse('bikes_json'),
@@ -71,15 +43,128 @@ def _base_context():
 		'detail_pattern': reverse('model_detail', kwargs={'slug': '__slug__'}),
 		'book_url': reverse('book_test_ride'),
 		'offers_url': reverse('offers'),
-		'bike_choices': _bike_choices(),
 	}
 
 
-def bikes_json(request):
+def _base_context():
+	context = _url_context()
+	context['bike_choices'] = catalog_snapshot.get().choices
+	return context
+
+
+async def _abase_context():
+	context = _url_context()
+	context['bike_choices'] = (await catalog_snapshot.aget()).choices
+	return context
+
+
+def _lead_source(request):
+	"""Return the URL name of the page a form was posted from, for lead analytics"""
+	referer = request.META.get('HTTP_REFERER', '')
+	if not referer:
+		return ''
+	try:
+		return resolve(urlsplit(referer).path).url_name or ''
+	except Resolver404:
+		return ''
+
+
+# Template rendering touches the session (messages, CSRF), which is sync-only.
+_arender = sync_to_async(render)
+
+
+async def bikes_json(request):
 	"""API endpoint to return bikes data as JSON (for frontend compatibility)"""
-	bikes = Bike.objects.filter(is_active=True)
-	bikes_data = [_bike_to_dict(bike) for bike in bikes]
-	return JsonResponse({'bikes': bikes_data})
+	catalog = await catalog_snapshot.aget()
+	return HttpResponse(catalog.bikes_json, content_type='application/json')
+
+
+async def catalog_changes(request):
+	"""API endpoint returning the bikes and offers changed since a change feed version"""
+	try:
+		since = int(request.GET.get('since', 0))
+	except ValueError:
+		since = -1
+	if since < 0:
+		return JsonResponse({'error': 'since must be a change feed version'}, status=400)
+
+	version, changes = await sync_to_async(changes_since)(since)
+	if version is None:
+		return JsonResponse({'error': 'Unknown version, reload the full catalog'}, status=410)
+
+	# Deactivated bikes and offers drop out of the catalog just like deleted ones.
+	deleted_bikes = [key for key, (_, action) in changes['bike'].items() if action == 'delete']
+	deleted_offers = [int(key) for key, (_, action) in changes['offer'].items() if action == 'delete']
+	active_bikes, offers = [], []
+	upserted = {pk: key for key, (pk, action) in changes['bike'].items() if action == 'upsert'}
+	if upserted:
+		found = set()
+		async for bike in Bike.objects.filter(pk__in=upserted):
+			found.add(bike.pk)
+			if bike.is_active:
+				active_bikes.append(bike)
+			else:
+				deleted_bikes.append(bike.slug)
+		deleted_bikes += [key for pk, key in upserted.items() if pk not in found]
+	# Serializing may reload the stock index, which queries the database.
+	bikes = await sync_to_async(lambda: [_bike_to_dict(bike) for bike in active_bikes])()
+	upserted = [pk for pk, action in changes['offer'].values() if action == 'upsert']
+	if upserted:
+		found = set()
+		async for offer in Offer.objects.filter(pk__in=upserted).select_related('bike'):
+			found.add(offer.pk)
+			if offer.is_active:
+				offers.append(_offer_to_dict(offer))
+			else:
+				deleted_offers.append(offer.pk)
+		deleted_offers += [pk for pk in upserted if pk not in found]
+
+	return JsonResponse({
+		'version': version,
+		'bikes': bikes,
+		'deletedBikes': deleted_bikes,
+		'offers': offers,
+		'deletedOffers': deleted_offers,
+	})
+
+
+def test_ride_slots(request):
+	"""API endpoint listing free test-ride slots for a bike over the booking window"""
+	days = availability_index.free_slots(request.GET.get('bike', ''))
+	if days is None:
+		return JsonResponse({'error': 'Unknown bike'}, status=404)
+	return JsonResponse({
+		'bike': request.GET['bike'],
+		'days': [
+			{
+				'date': date.isoformat(),
+				'slots': [{'time': start.strftime('%H:%M'), 'remaining': remaining} for start, remaining in slots],
+			}
+			for date, slots in days
+		],
+	})
+
+
+def stock(request):
+	"""API endpoint with units in stock per colour and branch, for one bike and branch or all of them"""
+	branches, bikes = stock_index.snapshot(bike_slug=request.GET.get('bike'), branch_slug=request.GET.get('branch'))
+	return JsonResponse({
+		'branches': [{'slug': slug, 'name': name} for slug, name in branches.items()],
+		'bikes': bikes,
+	})
+
+
+def service_availability(request):
+	"""API endpoint listing the next dates with free service bay capacity"""
+	try:
+		limit = max(1, min(int(request.GET.get('limit', 7)), settings.SERVICE_BOOKING_DAYS))
+	except ValueError:
+		limit = 7
+	start = timezone.localdate()
+	planner = ServicePlanner(start, start + timedelta(days=settings.SERVICE_BOOKING_DAYS - 1))
+	return JsonResponse({
+		'dates': [{'date': day.isoformat(), 'free': free} for day, free in planner.next_available(limit=limit)],
+	})
 
 
 def home(request):
@@ -105,33 +190,32 @@ def models_list(request):
 	return render(request, 'showroom/models.html', context)
 
 
-def model_detail(request, slug):
-	bike = _bike_map().get(slug)
-	if not bike:
+async def model_detail(request, slug):
+	catalog = await catalog_snapshot.aget()
+	if slug not in catalog.bikes:
 		raise Http404('Bike not found')
 
-	context = _base_context()
+	context = await _abase_context()
 	context.update(
 		{
 			'page_slug': slug,
-			'selected_bike': bike,
+			'selected_bike': catalog.bikes[slug],
 		}
 	)
-	return render(request, 'showroom/model_detail.html', context)
+	return await _arender(request, 'showroom/model_detail.html', context)
 
 
-def offers(request):
-	context = _base_context()
+async def offers(request):
+	context = await _abase_context()
 	# Get active offers
-	from django.utils import timezone
 	today = timezone.now().date()
 	active_offers = Offer.objects.filter(
 		is_active=True,
 		valid_from__lte=today,
 		valid_until__gte=today
 	).select_related('bike')
-	context['offers'] = active_offers
-	return render(request, 'showroom/offers.html', context)
+	context['offers'] = [offer async for offer in active_offers]
+	return await _arender(request, 'showroom/offers.html', context)
 
 
 def book_test_ride(request):
@@ -150,14 +234,15 @@ def service(request):
 	return render(request, 'showroom/service.html', _base_context())
 
 
-def submit_test_ride(request):
+@protect_form('book_test_ride')
+async def submit_test_ride(request):
 	if request.method != 'POST':
 		return redirect('book_test_ride')
 
 	data = request.POST
 	bike_slug = data.get('model') or ''
-	bike_map = _bike_map()
-	if bike_slug not in bike_map:
+	bike = await Bike.objects.filter(is_active=True, slug=bike_slug).afirst()
+	if not bike:
 		messages.error(request, 'Please select a valid bike model.')
 		return redirect('book_test_ride')
 
@@ -168,50 +253,74 @@ def submit_test_ride(request):
 		messages.error(request, 'Please provide a valid date and time for your test ride request.')
 		return redirect('book_test_ride')
 
-	TestRideRequest.objects.create(
-		name=data.get('name', '').strip(),
-		email=data.get('email', '').strip(),
-		phone=data.get('phone', '').strip(),
-		bike_slug=bike_slug,
-		preferred_date=preferred_date,
-		preferred_time=preferred_time,
+	first_day, last_day = booking_window()
+	start_time = slot_start_for(preferred_time)
+	if not first_day <= preferred_date <= last_day or start_time is None:
+		messages.error(request, 'Please choose a test ride slot within our showroom hours over the next two weeks.')
+		return redirect('book_test_ride')
+	if slot_has_started(preferred_date, start_time):
+		messages.error(request, 'That test ride slot has already started. Please pick a later time.')
+		return redirect('book_test_ride')
+
+	name = data.get('name', '').strip()
+	email = data.get('email', '').strip()
+	phone = data.get('phone', '').strip()
+	ride = await sync_to_async(reserve_test_ride)(
+		bike,
+		preferred_date,
+		preferred_time,
+		start_time,
+		name=name,
+		email=email,
+		phone=phone,
 		notes=data.get('notes', '').strip(),
+		source=_lead_source(request),
 	)
+	if ride is None:
+		messages.error(request, 'Sorry, that test ride slot is fully booked. Please pick another time.')
+		return redirect('book_test_ride')
 
 	messages.success(request, 'Thank you! Our team will call you to confirm your test ride slot shortly.')
 	return redirect('book_test_ride')
 
 
-def submit_contact(request):
+@protect_form('contact')
+async def submit_contact(request):
 	if request.method != 'POST':
 		return redirect('contact')
 
 	data = request.POST
 	bike_slug = data.get('model', '').strip()
-	bike_map = _bike_map()
+	bike_map = (await catalog_snapshot.aget()).bikes
 	if bike_slug and bike_slug not in bike_map:
 		messages.error(request, 'Please choose a valid bike model.')
 		return redirect('contact')
 
-	ContactInquiry.objects.create(
-		name=data.get('name', '').strip(),
-		email=data.get('email', '').strip(),
-		phone=data.get('phone', '').strip(),
+	name = data.get('name', '').strip()
+	email = data.get('email', '').strip()
+	phone = data.get('phone', '').strip()
+	await sync_to_async(create_lead)(
+		ContactInquiry,
+		name=name,
+		email=email,
+		phone=phone,
 		bike_slug=bike_slug,
 		message=data.get('message', '').strip(),
+		source=_lead_source(request),
 	)
 
 	messages.success(request, 'Thanks for reaching out! Our showroom team will contact you shortly.')
 	return redirect('contact')
 
 
-def submit_service(request):
+@protect_form('service')
+async def submit_service(request):
 	if request.method != 'POST':
 		return redirect('service')
 
 	data = request.POST
 	bike_slug = data.get('model') or ''
-	bike_map = _bike_map()
+	bike_map = (await catalog_snapshot.aget()).bikes
 	if bike_slug not in bike_map:
 		messages.error(request, 'Please select a valid bike model for the service booking.')
 		return redirect('service')
@@ -222,13 +331,26 @@ def submit_service(request):
 		messages.error(request, 'Please choose a valid date for the service visit.')
 		return redirect('service')
 
-	ServiceBooking.objects.create(
-		name=data.get('name', '').strip(),
-		phone=data.get('phone', '').strip(),
+	if preferred_date < timezone.localdate():
+		messages.error(request, 'Please choose a valid date for the service visit.')
+		return redirect('service')
+
+	name = data.get('name', '').strip()
+	phone = data.get('phone', '').strip()
+	booking, free_date = await sync_to_async(reserve_service)(
+		preferred_date,
+		name=name,
+		phone=phone,
 		bike_slug=bike_slug,
-		preferred_date=preferred_date,
 		notes=data.get('notes', '').strip(),
+		source=_lead_source(request),
 	)
+	if booking is None:
+		if free_date:
+			messages.error(request, f'Our service bays are fully booked on {preferred_date:%d %b}. The next available date is {free_date:%d %b}.')
+		else:
+			messages.error(request, f'Our service bays are fully booked around {preferred_date:%d %b}. Please call us to schedule a visit.')
+		return redirect('service')
 
 	messages.success(request, 'Service slot request saved. Our advisors will confirm your appointment soon.')
 	return redirect('service')
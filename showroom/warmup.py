@@ -0,0 +1,40 @@
+"""Paying the first-request costs of a fresh worker before it takes traffic"""
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.template.loader import get_template
+from django.urls import reverse
+
+from .availability import availability_index
+from .catalog import catalog_snapshot
+from .urls import urlpatterns
+
+
+def showroom_templates():
+	"""Return the names of the showroom's public page templates (not its admin overrides)"""
+	root = Path(apps.get_app_config('showroom').path) / 'templates'
+	return sorted(path.relative_to(root).as_posix() for path in (root / 'showroom').rglob('*.html'))
+
+
+def warm_caches():
+	"""
+	Build the catalog snapshot and bikes.json body, load the test-ride
+	availability index, compile every showroom template into the cached
+	loader and populate the URL resolver. Returns {step: milliseconds}.
+	"""
+	timings = {}
+
+	def step(name, func):
+		started = time.perf_counter()
+		func()
+		timings[name] = (time.perf_counter() - started) * 1000
+
+	step('urls', lambda: [
+		reverse(pattern.name, kwargs={'slug': 'warm-up'} if 'slug' in pattern.pattern.converters else {})
+		for pattern in urlpatterns
+	])
+	step('catalog', catalog_snapshot.get)
+	step('availability', lambda: availability_index.free_slots(''))
+	step('templates', lambda: [get_template(name) for name in showroom_templates()])
+	return timings